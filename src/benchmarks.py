@@ -0,0 +1,103 @@
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+from calibration_sim import HayatiModel
+from robotic_transformations import dh_trans, hayati_trans
+from identification import identification_jacobian, measured_transforms, normal_equations, transforms_to_poses
+import robot_visualization
+
+def measure(func, repeats: int = 5, number: int = 1) -> dict:
+    """Seconds per call of func: best, median and mean over repeats of `number` calls."""
+    func()
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start_time)/number)
+    return {"min": min(timings), "median": float(np.median(timings)), "mean": float(np.mean(timings)),
+            "repeats": repeats, "number": number}
+
+def lm_iteration(model: HayatiModel, angles: np.ndarray, measured_tf: np.ndarray):
+    # One iteration: normal equations for the current params and the damped solve
+    columns = model.identifiability_mask == 1
+    jtj, jtr, _ = normal_equations(model.get_params_vector('estimated'), model.nominal_dh, angles, measured_tf,
+                                   model.measurable_params_mask, columns)
+    return np.linalg.solve(jtj + model.lm_koef*np.diag(np.diag(jtj)) + 1e-12*np.eye(len(jtr)), jtr)
+
+def run_benchmarks(model: HayatiModel, quick: bool = False) -> dict:
+    rng = np.random.default_rng(0)
+    sizes = [1000, 10000] if quick else [1000, 10000, 100000]
+    repeats = 3 if quick else 5
+    limits = (model.joint_limits_general_l, model.joint_limits_general_h)
+    angles = {size: rng.uniform(*limits, (size, 6)) for size in sizes}
+    poses = angles[1000]
+    results = {}
+
+    results["dh_trans"] = measure(lambda: dh_trans(model.nominal_dh[0], 0.3), repeats, 10000)
+    results["hayati_trans"] = measure(lambda: hayati_trans(model.nominal_dh[1], 0.3), repeats, 10000)
+    results["get_transition_matrix_scalar_1000"] = measure(lambda: [model.get_transition_matrix(q, 'nominal') for q in poses], repeats)
+    results["get_joint_coordinates_and_transition_matrix_scalar_1000"] = measure(
+        lambda: [model.get_joint_coordinates_and_transition_matrix(q, 'nominal') for q in poses], repeats)
+    for size in sizes:
+        results[f"get_transition_matrices_batched_{size}"] = measure(lambda: model.get_transition_matrices(angles[size], 'nominal'), repeats)
+        results[f"get_joint_coordinates_batched_{size}"] = measure(lambda: model.get_joint_coordinates(angles[size], 'nominal'), repeats)
+        results[f"identification_jacobian_{size}"] = measure(
+            lambda: identification_jacobian(*model.get_model_params('nominal'), angles[size]), repeats)
+        measured_tf = measured_transforms(transforms_to_poses(model.get_transition_matrices(angles[size], 'real')))
+        results[f"lm_iteration_{size}"] = measure(lambda: lm_iteration(model, angles[size], measured_tf), repeats)
+
+    robot_display = robot_visualization.ShowRobot(model.cartesian_limits)
+    frames = [model.get_joint_coordinates_and_transition_matrix(q, 'nominal')["coords"] for q in poses[:50]]
+    frame_index = iter(range(10**9))
+    results["show_robot_update_robot"] = measure(lambda: robot_display.update_robot(frames[next(frame_index) % len(frames)]), repeats, 10)
+    robot_display.close()
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Benchmarks whose median time grew by more than tolerance (relative) against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"]/baseline[name]["median"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def main(args):
+    with open(args.config, 'r') as config_file:
+        model = HayatiModel(json.load(config_file))
+    report = {"meta": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "quick": args.quick},
+              "results": run_benchmarks(model, args.quick)}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            regressions = compare(report["results"], json.load(baseline_file)["results"], args.tolerance)
+        report["regressions"] = regressions
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for name, result in report["results"].items():
+        ratio = f"  x{result['baseline_ratio']:.2f}" if "baseline_ratio" in result else ""
+        print(f"{name:60s} {result['median']*1e3:10.3f} ms{ratio}")
+    if regressions:
+        print(f"Regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of kinematics, calibration and visualization hot paths")
+    parser.add_argument("-c", "--config", help="Name of .json configuration file. Default: ARM95.json", default="ARM95.json")
+    parser.add_argument("-o", "--output", help="Output JSON file. Default: benchmarks.json", default="benchmarks.json")
+    parser.add_argument("-b", "--baseline", help="Benchmark JSON to compare against, exit code 1 on regressions")
+    parser.add_argument("--tolerance", help="Allowed relative slowdown against the baseline. Default: 0.2", type=float, default=0.2)
+    parser.add_argument("--quick", help="Smaller dataset sizes and fewer repeats", action="store_true")
+    args = parser.parse_args()
+    main(args)
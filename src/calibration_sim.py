@@ -2,19 +2,44 @@ import numpy as np
 import matplotlib.pyplot as plt 
 from math import cos, sin, pi, sqrt, atan2, asin, log10, acos, copysign
 from typing import Union
-from math_routines import x_rot, y_rot, z_rot, arbitrary_axis_rot, trans
-from robotic_transformations import dh_trans, hayati_trans
+from robotic_transformations import dh_trans, hayati_trans, KinematicChain
+from identification import identification_jacobian
+from dataset import load_dataset, load_circles_dataset, generate_datasets, csv_to_binary, dataset_metadata, is_binary_dataset, read_binary_header
+from circle_fitting import initial_guess
+from parallel_identification import run_optimization
+from identifiability import analyze_identifiability
+from compensation import CompensationTable
+from parameter_sets import ParameterRegistry
+from monte_carlo import run_study
+from measurement_model import MeasurementModel
+from joint_state_channel import JointStateChannel
+from offscreen_rendering import load_trajectory, render_trajectory
+import os
 import robot_visualization 
 import pygame
 import joystick 
 import argparse
 import json
 import time
-from ctypes import c_float
+import hashlib
 import multiprocessing as mp
 
+def parameter_property(type: str, name: str) -> property:
+    # Model attribute backed by a registry parameter set, assignments bump the set version
+    def getter(self):
+        return getattr(self.parameter_sets[type], name)
+    def setter(self, value):
+        self.parameter_sets[type].set(**{name: value})
+    return property(getter, setter)
+
+# Config keys which define the simulated robot, datasets store their hash to detect mismatching configs
+MODEL_CONFIG_KEYS = ["nominal_dh", "nominal_base_params", "nominal_tool_params",
+                     "real_dh", "real_base_params", "real_tool_params", "zero_tracker_position"]
+
 class HayatiModel:
     def __init__(self, config):
+        self.robot_name = config.get("robot_name", "")
+        self.config_hash = hashlib.sha256(json.dumps({key: config[key] for key in MODEL_CONFIG_KEYS}, sort_keys=True).encode()).hexdigest()
         self.optimization_method = config['optimization_method']
         self.dataset_file = config['dataset_file']
         self.base_circles_dataset_file = config['base_circles_dataset_file']
@@ -22,17 +47,12 @@ class HayatiModel:
         self.results_file = config["results_file"]
 
          # DH params: [a, alpha, d/beta, theta_offset, parallel_axis]. Angle beta is used instead of d if axis is nearly parallel to the previous
-        self.nominal_dh = config['nominal_dh']
-        self.nominal_base_params = config['nominal_base_params']
-        self.nominal_tool_params = config['nominal_tool_params']
-        
-        self.estimated_dh = self.nominal_dh.copy()
-        self.estimated_base_params = self.nominal_base_params.copy()
-        self.estimated_tool_params = self.nominal_tool_params.copy()
-        
-        self.real_dh = config['real_dh']
-        self.real_base_params = config['real_base_params']
-        self.real_tool_params = config['real_tool_params']
+        # Model params live in the registry, the *_dh/*_base_params/*_tool_params attributes read and write it
+        self.parameter_sets = ParameterRegistry()
+        self.parameter_sets.add('nominal', config['nominal_dh'], config['nominal_base_params'], config['nominal_tool_params'])
+        self.parameter_sets.add('estimated', [list(unit) for unit in config['nominal_dh']],
+                                list(config['nominal_base_params']), list(config['nominal_tool_params']))
+        self.parameter_sets.add('real', config['real_dh'], config['real_base_params'], config['real_tool_params'])
 
         self.angle_dist = self.linear_dist = self.base_dist = self.tool_dist = 0
         
@@ -49,6 +69,31 @@ class HayatiModel:
         self.circle_samples_number = config["circle_samples_number"]
 
         self.zero_tracker_position = config["zero_tracker_position"]
+        # Measurement errors of generated datasets, list of components, e.g. [{"type": "tracker", "range_std": 1e-5}]
+        self.measurement_model = MeasurementModel.from_config(config.get("measurement_model", []), self.zero_tracker_position)
+
+        self.circle_points_number = config.get("circle_points_number", 10)
+        self.workers = config.get("workers", mp.cpu_count())
+        # Rows per chunk of the streaming solver
+        self.chunk_size = config.get("chunk_size", 100000)
+        # Number of dataset poses used to find identifiable params before calibration, 0 keeps identifiability_mask
+        self.identifiability_poses_number = config.get("identifiability_poses_number", 1000)
+        # Size of the candidate pool for observability based selection of general poses, 0 samples them randomly
+        self.pose_selection_candidates = config.get("pose_selection_candidates", 0)
+
+        self.compensation_file = config.get("compensation_file", "compensation.npz")
+        self.compensation_grid_shape = config.get("compensation_grid_shape", [5, 5, 5, 5, 5, 5])
+
+        # Monte Carlo study: trials with random real params around nominal, std per link [a, alpha, d/beta, theta_offset]
+        # and for base/tool [position, angle]. Measurements follow measurement_model
+        self.study_trials = config.get("study_trials", 100)
+        self.study_seed = config.get("study_seed", 0)
+        self.study_poses_number = config.get("study_poses_number", 200)
+        self.study_validation_poses_number = config.get("study_validation_poses_number", 1000)
+        # Circles per base/tool circle dataset of a trial for the initial guess, 0 starts from nominal base/tool
+        self.study_circles_number = config.get("study_circles_number", 20)
+        self.study_dh_std = config.get("study_dh_std", [1e-3, 1e-3, 1e-3, 1e-3])
+        self.study_base_tool_std = config.get("study_base_tool_std", [1e-3, 1e-3])
 
         self.measurable_params_mask = np.array([0, 1, 2, 3, 4, 5], dtype='int')
 
@@ -58,6 +103,16 @@ class HayatiModel:
         self.norm = 10
         self.prev_norm = 0
         self.num_point = 0
+
+    nominal_dh = parameter_property('nominal', 'dh')
+    nominal_base_params = parameter_property('nominal', 'base_params')
+    nominal_tool_params = parameter_property('nominal', 'tool_params')
+    estimated_dh = parameter_property('estimated', 'dh')
+    estimated_base_params = parameter_property('estimated', 'base_params')
+    estimated_tool_params = parameter_property('estimated', 'tool_params')
+    real_dh = parameter_property('real', 'dh')
+    real_base_params = parameter_property('real', 'base_params')
+    real_tool_params = parameter_property('real', 'tool_params')
     
     def get_transforms(self, angles: Union[np.ndarray, list], params: list) -> list:
         tfs = []
@@ -68,95 +123,217 @@ class HayatiModel:
                 tfs.append(hayati_trans(unit, angles[index]))
         return tfs
     
-    def get_base_tool_tf(self, base_params, tool_params):
-        main_tf = trans(base_params[:3]) @ z_rot(base_params[3]) @ y_rot(base_params[4]) @ x_rot(base_params[5])
-        tool = trans(tool_params[:3]) @ z_rot(tool_params[3]) @ y_rot(tool_params[4]) @ x_rot(tool_params[5])
-        return main_tf, tool
+    def get_model_params(self, type: str):
+        return self.parameter_sets[type].params
+    
+    def get_chain(self, type: str) -> KinematicChain:
+        # Cached by the registry until the params of this type are written again
+        return self.parameter_sets[type].chain
 
     def get_transition_matrix(self, angles: Union[np.ndarray, list], type: str) -> np.ndarray:
-        if type == 'estimated':
-            params = self.estimated_dh
-            tool_params = self.estimated_tool_params
-            base_params = self.estimated_base_params
-        elif type == 'nominal':
-            params = self.nominal_dh
-            tool_params = self.nominal_tool_params
-            base_params = self.nominal_base_params
-        elif type == 'real':
-            params = self.real_dh
-            tool_params = self.real_tool_params
-            base_params = self.real_base_params
-        else:
-            raise ValueError("type must be 'nominal', 'real' or 'estimated'")
-        main_tf, tool = self.get_base_tool_tf(base_params, tool_params)
-
-        tfs = self.get_transforms(angles, params)
-        for tf in tfs:
-            main_tf = main_tf @ tf
-        return main_tf @ tool
+        return self.get_chain(type).transition_matrix(angles)
     
-    def get_joint_coordinates_and_transition_matrix(self, angles: Union[np.ndarray, list], type: str) -> np.ndarray:
-        if type == 'estimated':
-            params = self.estimated_dh
-            tool_params = self.estimated_tool_params
-            base_params = self.estimated_base_params
-        elif type == 'nominal':
-            params = self.nominal_dh
-            tool_params = self.nominal_tool_params
-            base_params = self.nominal_base_params
-        elif type == 'real':
-            params = self.real_dh
-            tool_params = self.real_tool_params
-            base_params = self.real_base_params
-        else:
-            raise ValueError("type must be 'nominal', 'real' or 'estimated'")
-        main_tf, tool = self.get_base_tool_tf(base_params, tool_params)
-        result = {"coords": [], "transition_matrix": []}
-        result["coords"].append([main_tf[0][-1], main_tf[1][-1], main_tf[2][-1]])
-
-        tfs = self.get_transforms(angles, params)
-        for i, tf in enumerate(tfs):
-            main_tf = main_tf @ tf
-            result["coords"].append([main_tf[0][-1], main_tf[1][-1], main_tf[2][-1]])
-        
-        result["transition_matrix"] = main_tf @ tool
-        result["coords"].append([result["transition_matrix"][0][-1], result["transition_matrix"][1][-1], result["transition_matrix"][2][-1]])
+    def get_transition_matrices(self, angles: Union[np.ndarray, list], type: str, with_tool: bool = True) -> np.ndarray:
+        # Batched version of get_transition_matrix: (N, 6) angles -> (N, 4, 4) flange/tool transforms
+        return self.get_chain(type).transition_matrices(angles, with_tool)
+    
+    def get_params_vector(self, type: str) -> np.ndarray:
+        return self.parameter_sets[type].vector.copy()
 
-        return result
+    def set_params_vector(self, type: str, vector: np.ndarray):
+        if type == 'nominal':
+            raise ValueError("type must be 'real' or 'estimated'")
+        self.parameter_sets[type].set_vector(vector, self.nominal_dh)
+
+    def get_identification_jacobian(self, angles: Union[np.ndarray, list], type: str = 'estimated',
+                                    identifiability_mask: np.ndarray = None) -> np.ndarray:
+        # (N, measurable, identifiable) Jacobian, rows follow measurable_params_mask, columns follow identifiability_mask
+        # of the model unless another mask is given
+        mask = self.identifiability_mask if identifiability_mask is None else np.asarray(identifiability_mask)
+        params, base_params, tool_params = self.get_model_params(type)
+        _, jac = identification_jacobian(params, base_params, tool_params, angles)
+        return jac[:, self.measurable_params_mask][:, :, mask == 1]
+    
+    def get_frames(self, angles: Union[np.ndarray, list], type: str) -> np.ndarray:
+        # Base, link and tool frames: (6,) angles -> (8, 4, 4), (N, 6) angles -> (N, 8, 4, 4)
+        return self.get_chain(type).frames(angles)
+
+    def get_joint_coordinates(self, angles: np.ndarray, type: str) -> np.ndarray:
+        # Batched joint coordinates: (N, 6) angles -> (N, 8, 3), the same points as in get_joint_coordinates_and_transition_matrix
+        return self.get_chain(type).joint_coordinates(angles)
+
+    def get_joint_coordinates_and_transition_matrix(self, angles: Union[np.ndarray, list], type: str) -> dict:
+        frames = self.get_frames(angles, type)
+        return {"coords": frames[..., :3, 3], "transition_matrix": frames[..., -1, :, :]}
+
+def frame_statistics(frame_times: list) -> dict:
+    if not frame_times:
+        return {"frames": 0}
+    frame_times = np.array(frame_times)
+    return {"frames": len(frame_times),
+            "mean_frame_time": float(np.mean(frame_times)),
+            "p95_frame_time": float(np.percentile(frame_times, 95)),
+            "max_frame_time": float(np.max(frame_times))}
 
 def vizualize(model: HayatiModel, visualization_model="nominal"):
     running = mp.Value("i", 1)
-    angles_values = mp.Array(c_float, 6)
+    channel = JointStateChannel.create()
    
-    joystick_proc = mp.Process(target=joystick.joystick_process, args=(model.joint_limits_general_h, model.joint_limits_general_l, angles_values, running, visualization_model))
+    joystick_proc = mp.Process(target=joystick.joystick_process, args=(model.joint_limits_general_h, model.joint_limits_general_l, channel, running, visualization_model))
     joystick_proc.start()
-    time.sleep(1)
 
     robot_display = robot_visualization.ShowRobot(model.cartesian_limits)
-    plot_update_interval = 0.016  # ~60 FPS
-    last_update_time = time.time()
-    while running:
-        current_time = time.time()
-        if current_time - last_update_time >= plot_update_interval:
-            coords_and_matrix = model.get_joint_coordinates_and_transition_matrix(angles_values, visualization_model)
-                
-            robot_display.update_robot(coords_and_matrix["coords"])
-            last_update_time = current_time
-            
-            # Small sleep to prevent CPU spinning
-            time.sleep(0.001)
-    pygame.quit()
+    plot_update_interval = 1/60
+    frame_times = []
+    last_angles = None
+    next_frame_time = time.perf_counter()
+    try:
+        while running.value and joystick_proc.is_alive():
+            state = channel.latest()
+            angles = None if state is None else state[2]
+            if angles is not None and (last_angles is None or not np.array_equal(angles, last_angles)):
+                frame_start = time.perf_counter()
+                coords_and_matrix = model.get_joint_coordinates_and_transition_matrix(angles, visualization_model)
+                robot_display.update_robot(coords_and_matrix["coords"])
+                frame_times.append(time.perf_counter() - frame_start)
+                last_angles = angles
+            else:
+                robot_display.fig.canvas.flush_events()
+
+            next_frame_time += plot_update_interval
+            delay = next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Frame overran its deadline, don't try to catch up with a burst of frames
+                next_frame_time = time.perf_counter()
+    finally:
+        running.value = 0
+        joystick_proc.join(timeout=1)
+        if joystick_proc.is_alive():
+            joystick_proc.terminate()
+        robot_display.close()
+        channel.close()
+
+    stats = frame_statistics(frame_times)
+    if stats["frames"]:
+        print(f"Frames: {stats['frames']}, mean {stats['mean_frame_time']*1e3:.1f} ms, "
+              f"p95 {stats['p95_frame_time']*1e3:.1f} ms, max {stats['max_frame_time']*1e3:.1f} ms")
+    return stats
+
+
+def save_results(model: HayatiModel, report: dict):
+    params_error = model.get_params_vector('estimated') - model.get_params_vector('real')
+    results = {"optimization_method": model.optimization_method,
+               "estimated_dh": model.estimated_dh,
+               "estimated_base_params": model.estimated_base_params,
+               "estimated_tool_params": model.estimated_tool_params,
+               "identifiability_mask": model.identifiability_mask.tolist(),
+               "params_error": params_error.tolist(),
+               "max_params_error": float(np.max(np.abs(params_error[model.identifiability_mask == 1]), initial=0)),
+               **report}
+    with open(model.results_file, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+def load_results(model: HayatiModel):
+    with open(model.results_file, 'r') as results_file:
+        results = json.load(results_file)
+    model.estimated_dh = results["estimated_dh"]
+    model.estimated_base_params = results["estimated_base_params"]
+    model.estimated_tool_params = results["estimated_tool_params"]
+    model.identifiability_mask = np.array(results["identifiability_mask"], dtype='int')
+
+def build_compensation(model: HayatiModel) -> dict:
+    start_time = time.time()
+    table = CompensationTable.build(model, model.compensation_grid_shape)
+    table.save(model.compensation_file)
+    return {"build_time": time.time() - start_time, **table.metadata, **table.error_bounds(model)}
 
+def calibrate(model: HayatiModel) -> dict:
+    if is_binary_dataset(model.dataset_file) and read_binary_header(model.dataset_file)[0].get("config_hash") != model.config_hash:
+        print(f"Warning: {model.dataset_file} was generated for another robot config")
+    angles, measured_poses = load_dataset(model.dataset_file)
+    if angles.shape[0] == 0:
+        raise ValueError(f"dataset {model.dataset_file} has no rows")
+    start_time = time.time()
+    circles_report = None
+    if os.path.exists(model.base_circles_dataset_file) and os.path.exists(model.tool_circles_dataset_file):
+        base_circles = load_circles_dataset(model.base_circles_dataset_file)
+        tool_circles = load_circles_dataset(model.tool_circles_dataset_file)
+        # Header-only circle datasets (circle_samples_number 0) leave base and tool params as they are
+        if len(base_circles[0]) and len(tool_circles[0]):
+            circles_report = initial_guess(model, base_circles, tool_circles, (angles, measured_poses))
+    identifiability_report = None
+    if model.identifiability_poses_number:
+        step = max(1, angles.shape[0]//model.identifiability_poses_number)
+        identifiability_report = analyze_identifiability(model, np.asarray(angles[::step]))
+    report = run_optimization(model, angles, measured_poses,
+                              model.dataset_file if is_binary_dataset(model.dataset_file) else None)
+    report["initial_guess"] = circles_report
+    report["identifiability"] = identifiability_report
+    report["calibration_time"] = time.time() - start_time
+    report["samples_number"] = angles.shape[0]
+    save_results(model, report)
+    return report
 
 def main(args):
     with open(args.config, 'r') as config_file:
         config = json.load(config_file)
+    config.setdefault("robot_name", os.path.splitext(os.path.basename(args.config))[0])
     model = HayatiModel(config)
+    if args.convert:
+        rows = csv_to_binary(args.convert[0], args.convert[1], dataset_metadata(model))
+        print(f"{args.convert[0]} -> {args.convert[1]}: {rows} rows")
+        return
+    if args.generate:
+        start_time = time.time()
+        rows, sampling = generate_datasets(model, seed=args.seed)
+        for file_name, rows_number in rows.items():
+            print(f"{file_name}: {rows_number} rows")
+        print(f"Workspace sampler: acceptance rate {sampling['acceptance_rate']:.3f}, "
+              f"{sampling['samples_per_second']:.0f} samples/s per worker")
+        if "observability" in sampling:
+            print(f"Selected poses observability: {sampling['observability']}")
+        print(f"Generation finished in {time.time() - start_time:.2f} s")
+    if args.calibrate:
+        report = calibrate(model)
+        print(f"Calibration finished: norm {report['norm']:.3e}, {report['iterations']} iterations, "
+              f"{report['calibration_time']:.2f} s. Results saved to {model.results_file}")
+    if args.compensation:
+        if not args.calibrate:
+            load_results(model)
+        report = build_compensation(model)
+        print(f"Compensation table saved to {model.compensation_file} in {report['build_time']:.2f} s")
+        for name in ("uncompensated", "compensated"):
+            print(f"{name}: max position error {report[name]['max_position_error']:.3e}, "
+                  f"rms {report[name]['rms_position_error']:.3e}, "
+                  f"max orientation error {report[name]['max_orientation_error']:.3e}")
+    if args.study:
+        report = run_study(model)
+        with open(model.results_file, 'w') as results_file:
+            json.dump(report, results_file, indent=2)
+        summary = report["summary"]
+        print(f"Study of {report['trials_number']} trials finished in {report['study_time']:.2f} s, "
+              f"converged {summary['converged_fraction']:.1%}. Results saved to {model.results_file}")
+        for name in ("rms_position_error", "rms_orientation_error"):
+            print(f"{name}: mean {summary[name]['mean']:.3e}, p95 {summary[name]['p95']:.3e}, max {summary[name]['max']:.3e}")
+    if args.render:
+        report = render_trajectory(model, load_trajectory(args.render[0]), args.render[1], args.render_model)
+        print(f"Rendered {report['frames']} frames to {args.render[1]} in {report['render_time']:.2f} s ({report['fps']:.0f} FPS)")
+    if args.generate or args.calibrate or args.compensation or args.render or args.study:
+        return
     vizualize(model, "nominal")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-c", "--config", help="Name of .json configuration file. Default: ARM95.json", default="ARM95.json")
-    parser.add_argument("-g", "--generate", help="Generate dataset for selected method. Default: false", type=bool, default=False)
+    parser.add_argument("-g", "--generate", help="Generate dataset for selected method. Default: false", action="store_true")
+    parser.add_argument("--seed", help="Seed of dataset generation, the datasets do not depend on the number of workers", type=int)
+    parser.add_argument("--calibrate", help="Identify model parameters from dataset_file and save them to results_file", action="store_true")
+    parser.add_argument("--convert", help="Convert CSV dataset to the memory-mapped binary format and exit", nargs=2, metavar=("CSV", "BIN"))
+    parser.add_argument("--compensation", help="Build the joint space compensation table for the estimated model", action="store_true")
+    parser.add_argument("--study", help="Run Monte Carlo generate/calibrate/validate trials and save statistics to results_file", action="store_true")
+    parser.add_argument("--render", help="Render a joint trajectory or dataset without a display to a PNG directory or a video file", nargs=2, metavar=("TRAJECTORY", "OUTPUT"))
+    parser.add_argument("--render-model", help="Model used by --render: nominal, real or estimated. Default: nominal", default="nominal")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Tuple
+from math_routines import z_rot
+from identification import measured_transforms, transforms_to_poses, residual_norm
+
+def group_circles(circles: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Rows of circle datasets -> (C, P, ...) array, every circle must have the same number of points
+    if len(circles) == 0:
+        raise ValueError("circle dataset has no rows")
+    order = np.argsort(circles, kind='stable')
+    _, counts = np.unique(circles, return_counts=True)
+    if np.any(counts != counts[0]):
+        raise ValueError("all circles must have the same number of points")
+    return values[order].reshape((len(counts), counts[0]) + values.shape[1:])
+
+def fit_planes(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Least squares planes for a stack of point sets (C, P, 3): centroids, unit normals and in-plane basis (C, 2, 3)."""
+    centroids = points.mean(axis=1)
+    _, _, vt = np.linalg.svd(points - centroids[:, None], full_matrices=False)
+    return centroids, vt[:, 2], vt[:, :2]
+
+def fit_circles(points: np.ndarray) -> dict:
+    """Algebraic (Kasa) circle fit of (C, P, 3) points sampled in the order of joint rotation.
+
+    Normals are oriented along the rotation axis (right hand rule w.r.t. the point order).
+    """
+    centroids, normals, basis = fit_planes(points)
+    centered = points - centroids[:, None]
+    local = np.einsum('cpk,cjk->cpj', centered, basis)
+    # x^2 + y^2 = 2*a*x + 2*b*y + c, solved through stacked 3x3 normal equations
+    design = np.concatenate([2*local, np.ones(local.shape[:2] + (1,))], axis=2)
+    target = np.sum(local**2, axis=2)
+    solution = np.linalg.solve(np.einsum('cpi,cpj->cij', design, design), np.einsum('cpi,cp->ci', design, target)[..., None])[..., 0]
+    radii = np.sqrt(solution[:, 2] + solution[:, 0]**2 + solution[:, 1]**2)
+    centers = centroids + np.einsum('cj,cjk->ck', solution[:, :2], basis)
+
+    turn = np.sum(np.cross(points[:, :-1] - centers[:, None], points[:, 1:] - centers[:, None]), axis=1)
+    normals = normals*np.sign(np.sum(turn*normals, axis=1))[:, None]
+    radial = np.linalg.norm(local - solution[:, None, :2], axis=2) - radii[:, None]
+    plane = np.einsum('cpk,ck->cp', centered, normals)
+    rms = np.sqrt(np.mean(radial**2 + plane**2, axis=1))
+    return {"centers": centers, "normals": normals, "radii": radii, "rms": rms}
+
+def fit_axis(centers: np.ndarray, normals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Common rotation axis of several circles: mean direction and the mean of centers projected across it
+    direction = normals.mean(axis=0)
+    direction /= np.linalg.norm(direction)
+    point = centers.mean(axis=0)
+    return point - direction*(point @ direction), direction
+
+def estimate_base_params(model, circles: np.ndarray, measured_poses: np.ndarray) -> Tuple[list, dict]:
+    """Base params from circles recorded while joint 1 rotates.
+
+    Joint 1 rotates about the base z axis, so the fitted axis gives ry, rx and the base origin up to a shift
+    along the axis. The shift and rz couple with d and theta_offset of the first link and are kept nominal.
+    """
+    fit = fit_circles(group_circles(circles, measured_poses[:, :3]))
+    point, direction = fit_axis(fit["centers"], fit["normals"])
+    nominal = np.asarray(model.nominal_base_params, dtype='float')
+    rz = nominal[3]
+    local = z_rot(rz)[:3, :3].T @ direction
+    ry = np.arctan2(local[0], local[2])
+    rx = np.arctan2(-local[1], np.hypot(local[0], local[2]))
+    origin = point + direction*((nominal[:3] - point) @ direction)
+    base_params = [float(value) for value in origin] + [float(rz), float(ry), float(rx)]
+    return base_params, {"axis_point": point.tolist(), "axis_direction": direction.tolist(),
+                         "fit_rms": float(np.max(fit["rms"]))}
+
+def axis_correction(predicted_points: np.ndarray, predicted_directions: np.ndarray, centers: np.ndarray,
+                    normals: np.ndarray) -> np.ndarray:
+    """Rigid transform (4, 4) which moves predicted joint axes (C, 3 points and directions) onto fitted circle axes.
+
+    The rotation aligns the directions (Kabsch), the translation brings the corrected axes through the circle
+    centers in the least squares sense, i.e. only distances across the axes are minimized.
+    """
+    u, _, vt = np.linalg.svd(predicted_directions.T @ normals)
+    rotation = vt.T @ np.diag([1, 1, np.linalg.det(vt.T @ u.T)]) @ u.T
+    across = np.eye(3) - normals[:, :, None]*normals[:, None, :]
+    offsets = centers - predicted_points @ rotation.T
+    translation = np.linalg.lstsq(across.sum(axis=0), np.einsum('cij,cj->i', across, offsets), rcond=None)[0]
+    correction = np.eye(4)
+    correction[:3, :3] = rotation
+    correction[:3, 3] = translation
+    return correction
+
+def estimate_tool_params(model, circles: np.ndarray, angles: np.ndarray, measured_poses: np.ndarray) -> Tuple[list, dict]:
+    """Tool params from circles recorded while joint 6 rotates.
+
+    Fitted circle centers and normals give the measured joint 6 axes. Axes predicted by the estimated model are
+    moved onto them by a rigid correction, which absorbs base errors the base circles cannot resolve (rz and the
+    shift along the base axis). The tool point is then the least squares solution of R_k t + o_k = p_k over the
+    corrected flange frames, the tool orientation is updated only if orientations are measurable.
+    """
+    fit = fit_circles(group_circles(circles, measured_poses[:, :3]))
+    frames = model.get_frames(angles, 'estimated')
+    # Frame before joint 6, its z axis is the joint 6 axis and it does not move within a circle
+    axis_tf = group_circles(circles, frames[:, -3])[:, 0]
+    correction = axis_correction(axis_tf[:, :3, 3], axis_tf[:, :3, 2], fit["centers"], fit["normals"])
+    flange_tf = correction @ frames[:, -2]
+    local_points = np.einsum('nji,nj->ni', flange_tf[:, :3, :3], measured_poses[:, :3] - flange_tf[:, :3, 3])
+    tool_params = [float(value) for value in local_points.mean(axis=0)] + list(model.estimated_tool_params[3:])
+    if np.any(model.measurable_params_mask >= 3):
+        rotations = flange_tf[:, :3, :3].transpose(0, 2, 1) @ measured_transforms(measured_poses)[:, :3, :3]
+        u, _, vt = np.linalg.svd(rotations.mean(axis=0))
+        tool_tf = np.eye(4)
+        tool_tf[:3, :3] = u @ np.diag([1, 1, np.linalg.det(u @ vt)]) @ vt
+        tool_params[3:] = [float(value) for value in transforms_to_poses(tool_tf[None])[0, 3:]]
+    # Distance of the tool point from the joint 6 axis must match the fitted radii
+    axis = frames[0, -2, :3, :3].T @ frames[0, -3, :3, 2]
+    offset = np.array(tool_params[:3]) - frames[0, -2, :3, :3].T @ (frames[0, -3, :3, 3] - frames[0, -2, :3, 3])
+    radial = offset - (offset @ axis)*axis
+    return tool_params, {"flange_axis_direction": axis.tolist(), "mean_radius": float(np.mean(fit["radii"])),
+                         "radius_error": float(np.linalg.norm(radial) - np.mean(fit["radii"])),
+                         "correction_angle": float(np.arccos(np.clip((np.trace(correction[:3, :3]) - 1)/2, -1, 1))),
+                         "correction_shift": float(np.linalg.norm(correction[:3, 3])),
+                         "fit_rms": float(np.max(fit["rms"]))}
+
+def initial_guess(model, base_circles_dataset: tuple, tool_circles_dataset: tuple, dataset: tuple = None) -> dict:
+    """Sets estimated base and tool params from (circles, angles, poses) circle datasets.
+
+    If the general (angles, poses) dataset is given, every estimate is kept only if it decreases its residual,
+    the tool estimate relies on the estimated link params and may be worse than nominal for large link errors.
+    """
+    report = {}
+    norm = residual_norm(model, *dataset) if dataset is not None else None
+    for name, estimate, attribute, args in (("base", estimate_base_params, "estimated_base_params", base_circles_dataset[::2]),
+                                            ("tool", estimate_tool_params, "estimated_tool_params", tool_circles_dataset)):
+        previous = getattr(model, attribute)
+        params, report[name] = estimate(model, *args)
+        setattr(model, attribute, params)
+        if dataset is not None:
+            new_norm = residual_norm(model, *dataset)
+            report[name]["accepted"] = new_norm < norm
+            if new_norm < norm:
+                norm = new_norm
+            else:
+                setattr(model, attribute, previous)
+    return report
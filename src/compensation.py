@@ -0,0 +1,133 @@
+import numpy as np
+from itertools import product
+from typing import Union
+from identification import pose_residuals
+from inverse_kinematics import InverseKinematics, geometric_jacobian
+
+class CompensationTable:
+    """Regular joint space grid of corrections dq(q) such that estimated FK(q + dq) equals nominal FK(q).
+
+    A command q for the nominal model becomes q + dq(q) for the calibrated robot. Lookups are multilinear
+    interpolations over the 2^6 surrounding nodes, i.e. constant time per command.
+    """
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, corrections: np.ndarray, metadata: dict = None,
+                 valid: np.ndarray = None):
+        self.lower = np.asarray(lower, dtype='float')
+        self.upper = np.asarray(upper, dtype='float')
+        self.corrections = np.asarray(corrections, dtype='float')
+        self.shape = np.array(self.corrections.shape[:-1])
+        self.check_shape(self.shape)
+        # Nodes whose correction did not reduce the pose error store a zero correction and are marked invalid
+        self.valid = np.ones(self.shape, dtype='bool') if valid is None else np.asarray(valid, dtype='bool')
+        self.flat_corrections = self.corrections.reshape(-1, self.corrections.shape[-1])
+        self.metadata = metadata or {}
+        self.corners = np.array(list(product((0, 1), repeat=len(self.shape))), dtype='int')
+        self.strides = np.array([np.prod(self.shape[index + 1:]) for index in range(len(self.shape))], dtype='int')
+
+    @staticmethod
+    def check_shape(shape: Union[list, tuple, np.ndarray]):
+        # Multilinear lookup needs a cell, i.e. two nodes, along every joint
+        if np.any(np.asarray(shape) < 2):
+            raise ValueError(f"Compensation grid needs at least 2 nodes per joint, got shape {list(shape)}")
+
+    @staticmethod
+    def grid_nodes(lower: np.ndarray, upper: np.ndarray, shape: Union[list, tuple]) -> np.ndarray:
+        axes = [np.linspace(low, high, size) for low, high, size in zip(lower, upper, shape)]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(shape))
+
+    @classmethod
+    def avoid_singular_planes(cls, model, lower: np.ndarray, upper: np.ndarray, shape: Union[list, tuple],
+                              threshold: float = 1e-6) -> np.ndarray:
+        """Upper bounds moved inwards by half a cell along every joint with a node plane made of singular configurations
+        only (e.g. q5 = 0 of a spherical wrist for symmetric limits and an odd number of nodes), so no node lies on it
+        and all nodes stay reachable. Commands in the last half cell get the corrections of the boundary nodes."""
+        _, jac = geometric_jacobian(model.get_chain('nominal'), cls.grid_nodes(lower, upper, shape))
+        singular = (np.linalg.svd(jac, compute_uv=False)[:, -1] < threshold).reshape(tuple(shape))
+        upper = upper.copy()
+        for axis in range(len(shape)):
+            others = tuple(index for index in range(len(shape)) if index != axis)
+            if np.any(np.all(singular, axis=others)):
+                upper[axis] -= (upper[axis] - lower[axis])/(shape[axis] - 1)/2
+        return upper
+
+    @classmethod
+    def build(cls, model, shape: Union[list, tuple], lower: Union[np.ndarray, list] = None, upper: Union[np.ndarray, list] = None,
+              tolerance: float = 1e-10, max_correction: float = 0.1, max_error: float = 1e-6,
+              singular_damping: float = 0.05, singular_threshold: float = 1e-6) -> "CompensationTable":
+        """Solves IK on the estimated model for nominal FK of every grid node.
+
+        Near singularities (e.g. aligned wrist axes) exact IK drifts along the null space and returns huge
+        corrections. The grid is shifted off planes of singular nodes, nodes left with a pose error above max_error or
+        needing more than max_correction rad get a single strongly damped least squares step instead, which stays small
+        and smooth across the singular cell. A correction which does not reduce the pose error of its node is dropped.
+        """
+        cls.check_shape(shape)
+        lower = np.asarray(model.joint_limits_general_l if lower is None else lower, dtype='float')
+        upper = np.asarray(model.joint_limits_general_h if upper is None else upper, dtype='float')
+        upper = cls.avoid_singular_planes(model, lower, upper, shape, singular_threshold)
+        nodes = cls.grid_nodes(lower, upper, shape)
+        targets = model.get_transition_matrices(nodes, 'nominal')
+        result = InverseKinematics(model, 'estimated', tolerance=tolerance).solve(targets, nodes)
+        corrections = result["angles"] - nodes
+
+        singular = (result["errors"] > max_error) | (np.max(np.abs(corrections), axis=1) > max_correction)
+        if np.any(singular):
+            end_tf, jac = geometric_jacobian(model.get_chain('estimated'), nodes[singular])
+            errors = pose_residuals(end_tf, targets[singular])
+            jjt = jac @ jac.transpose(0, 2, 1) + singular_damping**2*np.eye(6)
+            corrections[singular] = np.einsum('nji,nj->ni', jac, np.linalg.solve(jjt, errors[..., None])[..., 0])
+
+        uncompensated = np.linalg.norm(pose_residuals(model.get_transition_matrices(nodes, 'estimated'), targets), axis=1)
+        compensated = np.linalg.norm(pose_residuals(model.get_transition_matrices(nodes + corrections, 'estimated'),
+                                                    targets), axis=1)
+        valid = compensated <= uncompensated
+        corrections[~valid] = 0
+        metadata = {"config_hash": model.config_hash, "singular_nodes": int(np.count_nonzero(singular)),
+                    "invalid_nodes": int(np.count_nonzero(~valid))}
+        return cls(lower, upper, corrections.reshape(tuple(shape) + (nodes.shape[1],)), metadata, valid.reshape(tuple(shape)))
+
+    def lookup(self, angles: Union[np.ndarray, list]) -> np.ndarray:
+        angles = np.asarray(angles, dtype='float')
+        single = angles.ndim == 1
+        angles = np.atleast_2d(angles)
+        position = np.clip((angles - self.lower)/(self.upper - self.lower)*(self.shape - 1), 0, self.shape - 1)
+        base = np.minimum(np.floor(position).astype('int'), self.shape - 2)
+        fraction = position - base
+        # (N, 64) weights and flat node indices of the surrounding cell corners
+        weights = np.prod(np.where(self.corners, fraction[:, None], 1 - fraction[:, None]), axis=2)
+        indices = (base @ self.strides)[:, None] + self.corners @ self.strides
+        result = np.einsum('nc,ncj->nj', weights, self.flat_corrections[indices])
+        return result[0] if single else result
+
+    def compensate(self, angles: Union[np.ndarray, list]) -> np.ndarray:
+        return np.asarray(angles, dtype='float') + self.lookup(angles)
+
+    def error_bounds(self, model, samples_number: int = 10000, seed: int = None, lower: Union[np.ndarray, list] = None,
+                     upper: Union[np.ndarray, list] = None) -> dict:
+        """Pose errors of compensated commands against the exact nominal FK on random joint configurations within
+        the joint limits of the model (or lower/upper), which may extend past the grid."""
+        lower = np.asarray(model.joint_limits_general_l if lower is None else lower, dtype='float')
+        upper = np.asarray(model.joint_limits_general_h if upper is None else upper, dtype='float')
+        angles = np.random.default_rng(seed).uniform(lower, upper, (samples_number, len(lower)))
+        targets = model.get_transition_matrices(angles, 'nominal')
+        invalid = np.argwhere(~self.valid)
+        report = {"valid_nodes": int(np.count_nonzero(self.valid)), "invalid_nodes": int(invalid.shape[0]),
+                  "invalid_node_angles": (self.lower + invalid/(self.shape - 1)*(self.upper - self.lower)).tolist()}
+        for name, commands in (("uncompensated", angles), ("compensated", self.compensate(angles))):
+            errors = pose_residuals(model.get_transition_matrices(commands, 'estimated'), targets)
+            position = np.linalg.norm(errors[:, :3], axis=1)
+            orientation = np.linalg.norm(errors[:, 3:], axis=1)
+            report[name] = {"max_position_error": float(position.max()), "rms_position_error": float(np.sqrt(np.mean(position**2))),
+                            "max_orientation_error": float(orientation.max()),
+                            "rms_orientation_error": float(np.sqrt(np.mean(orientation**2)))}
+        return report
+
+    def save(self, path: str):
+        np.savez(path, lower=self.lower, upper=self.upper, corrections=self.corrections, valid=self.valid,
+                 config_hash=self.metadata.get("config_hash", ""))
+
+    @classmethod
+    def load(cls, path: str) -> "CompensationTable":
+        with np.load(path) as data:
+            return cls(data["lower"], data["upper"], data["corrections"], {"config_hash": str(data["config_hash"])},
+                       data["valid"] if "valid" in data else None)
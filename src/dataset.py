@@ -0,0 +1,281 @@
+import numpy as np
+import multiprocessing as mp
+import json
+import os
+from collections import deque
+from itertools import islice
+from typing import Iterable, Tuple
+from identification import transforms_to_poses
+from sampler import WorkspaceSampler
+from pose_selection import select_poses
+from identifiability import analyze_identifiability
+
+# Row layout of measurement datasets: joint angles followed by measured pose [x, y, z, rz, ry, rx]
+DATASET_HEADER = "q1,q2,q3,q4,q5,q6,x,y,z,rz,ry,rx"
+# Circle datasets additionally store the circle index, points of one circle differ only in the rotated joint
+CIRCLES_DATASET_HEADER = "circle," + DATASET_HEADER
+JOINTS_NUMBER = 6
+BASE_CIRCLE_JOINT = 0
+TOOL_CIRCLE_JOINT = 5
+
+# Binary datasets: magic, little endian uint32 header size, JSON header padded to BINARY_ALIGNMENT, float64 rows
+BINARY_MAGIC = b"CALSIMDS"
+BINARY_EXTENSION = ".bin"
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 64
+# Spare header bytes, so the final rows number can be written in place after streaming
+BINARY_HEADER_RESERVE = 64
+
+_worker_model = None
+
+class BinaryDataset:
+    """Memory-mapped binary dataset, column accessors are zero-copy views of the mapped file."""
+    def __init__(self, path: str, mode: str = 'r'):
+        self.path = path
+        self.header, offset = read_binary_header(path)
+        self.columns = self.header["columns"]
+        self.data = np.memmap(path, dtype=self.header["dtype"], mode=mode, offset=offset,
+                              shape=(self.header["rows"], len(self.columns)))
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def column_index(self, name: str) -> int:
+        return self.columns.index(name)
+
+    @property
+    def angles(self) -> np.ndarray:
+        first = self.column_index("q1")
+        return self.data[:, first:first + JOINTS_NUMBER]
+
+    @property
+    def poses(self) -> np.ndarray:
+        first = self.column_index("x")
+        return self.data[:, first:first + 6]
+
+    @property
+    def circles(self) -> np.ndarray:
+        return self.data[:, self.column_index("circle")].astype('int')
+
+def read_binary_header(path: str) -> Tuple[dict, int]:
+    with open(path, 'rb') as dataset_file:
+        if dataset_file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary dataset")
+        header_size = int(np.frombuffer(dataset_file.read(4), dtype='<u4')[0])
+        header = json.loads(dataset_file.read(header_size).decode('utf-8'))
+    if header["version"] != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary dataset version: {header['version']}")
+    return header, len(BINARY_MAGIC) + 4 + header_size
+
+def is_binary_dataset(path: str) -> bool:
+    with open(path, 'rb') as dataset_file:
+        return dataset_file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+class BinaryDatasetWriter:
+    def __init__(self, path: str, header: str, metadata: dict = None):
+        self.path = path
+        self.header = {"version": BINARY_VERSION, "dtype": "<f8", "rows": 0, "columns": header.split(","), **(metadata or {})}
+        self.rows = 0
+        text = json.dumps(self.header)
+        # Header is padded so that the data offset is aligned, the padding leaves room for the rows number
+        self.header_size = -(-(len(BINARY_MAGIC) + 4 + len(text) + BINARY_HEADER_RESERVE)//BINARY_ALIGNMENT)*BINARY_ALIGNMENT
+        self.header_size -= len(BINARY_MAGIC) + 4
+        self.file = open(path, 'wb')
+        self.write_header()
+
+    def write_header(self):
+        text = json.dumps(dict(self.header, rows=self.rows)).encode('utf-8')
+        self.file.seek(0)
+        self.file.write(BINARY_MAGIC + np.array([self.header_size], dtype='<u4').tobytes() + text.ljust(self.header_size))
+        self.file.seek(0, os.SEEK_END)
+
+    def append(self, chunk: np.ndarray):
+        self.file.write(np.ascontiguousarray(chunk, dtype='<f8').tobytes())
+        self.rows += chunk.shape[0]
+
+    def close(self):
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvDatasetWriter:
+    def __init__(self, path: str, header: str, metadata: dict = None):
+        self.rows = 0
+        self.file = open(path, 'w')
+        self.file.write(header + "\n")
+
+    def append(self, chunk: np.ndarray):
+        np.savetxt(self.file, chunk, delimiter=',', fmt='%.12g')
+        self.rows += chunk.shape[0]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_dataset_writer(path: str, header: str, metadata: dict = None):
+    # Binary format is selected by the file extension
+    if os.path.splitext(path)[1] == BINARY_EXTENSION:
+        return BinaryDatasetWriter(path, header, metadata)
+    return CsvDatasetWriter(path, header, metadata)
+
+def load_csv(path: str) -> np.ndarray:
+    # (rows, columns) array, a CSV with the header only gives an empty array with all columns
+    with open(path, 'r') as csv_file:
+        columns = csv_file.readline().strip().split(',')
+        data_start = csv_file.tell()
+        if not csv_file.readline().strip():
+            return np.empty((0, len(columns)), dtype='float')
+        csv_file.seek(data_start)
+        return np.loadtxt(csv_file, delimiter=',', ndmin=2)
+
+def load_dataset(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    if is_binary_dataset(path):
+        dataset = BinaryDataset(path)
+        return dataset.angles, dataset.poses
+    data = load_csv(path)
+    return data[:, :JOINTS_NUMBER], data[:, JOINTS_NUMBER:JOINTS_NUMBER + 6]
+
+def load_circles_dataset(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if is_binary_dataset(path):
+        dataset = BinaryDataset(path)
+        return dataset.circles, dataset.angles, dataset.poses
+    return split_circles(load_csv(path))
+
+def split_circles(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # [circle, q1..q6, x, y, z, rz, ry, rx] rows -> (circles, angles, poses)
+    return data[:, 0].astype('int'), data[:, 1:JOINTS_NUMBER + 1], data[:, JOINTS_NUMBER + 1:JOINTS_NUMBER + 7]
+
+def csv_to_binary(csv_path: str, binary_path: str, metadata: dict = None, chunk_rows: int = 100000) -> int:
+    """Converts a CSV dataset to the binary format chunk by chunk, the column layout is taken from the CSV header."""
+    with open(csv_path, 'r') as csv_file, BinaryDatasetWriter(binary_path, csv_file.readline().strip(), metadata) as writer:
+        while True:
+            lines = list(islice(csv_file, chunk_rows))
+            if not lines:
+                break
+            writer.append(np.loadtxt(lines, delimiter=',', ndmin=2))
+    return writer.rows
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+def measure(model, angles: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Exact poses of the real model, then recorded angles and poses from the measurement model
+    poses = transforms_to_poses(model.get_transition_matrices(angles, 'real'))
+    return np.hstack(model.measurement_model.apply(angles, poses, rng))
+
+def measure_circles(model, first_circle: int, circles_number: int, joint: int, rng: np.random.Generator) -> np.ndarray:
+    """[circle, angles, poses] rows of circles_number circles swept by joint, the other joints are random and fixed per circle"""
+    points_number = model.circle_points_number
+    fixed = rng.uniform(model.joint_limits_circle_l, model.joint_limits_circle_h, (circles_number, JOINTS_NUMBER))
+    angles = np.repeat(fixed, points_number, axis=0)
+    sweep = np.linspace(model.joint_limits_circle_l[joint], model.joint_limits_circle_h[joint], points_number)
+    angles[:, joint] = np.tile(sweep, circles_number)
+    circles = np.repeat(np.arange(first_circle, first_circle + circles_number), points_number)
+    return np.column_stack([circles, measure(model, angles, rng)])
+
+def _measure_chunk(task) -> np.ndarray:
+    seed, angles = task
+    return measure(_worker_model, angles, np.random.default_rng(seed))
+
+def _general_chunk(task):
+    # A fresh sampler per chunk: the adapted proposal box must not depend on which chunks a worker processed before
+    seed, size = task
+    sampler = WorkspaceSampler(_worker_model, _worker_model.joint_limits_general_l, _worker_model.joint_limits_general_h,
+                               'real', np.random.default_rng(seed))
+    angles = sampler.sample(size)
+    return measure(_worker_model, angles, sampler.rng), (sampler.proposed_number, sampler.accepted_number, sampler.sampling_time)
+
+def _circles_chunk(task) -> np.ndarray:
+    seed, first_circle, circles_number, joint = task
+    return measure_circles(_worker_model, first_circle, circles_number, joint, np.random.default_rng(seed))
+
+def _bounded_imap(pool, func, tasks: Iterable, window: int):
+    # Ordered imap which keeps at most `window` chunks in flight, so results never pile up in memory
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def _collect_sampling_stats(chunks: Iterable, stats: dict):
+    for chunk, (proposed, accepted, sampling_time) in chunks:
+        stats["proposed"] += proposed
+        stats["accepted"] += accepted
+        stats["sampling_time"] += sampling_time
+        yield chunk
+
+def write_dataset_stream(path: str, header: str, chunks: Iterable[np.ndarray], metadata: dict = None) -> int:
+    with open_dataset_writer(path, header, metadata) as writer:
+        for chunk in chunks:
+            writer.append(chunk)
+    return writer.rows
+
+def dataset_metadata(model) -> dict:
+    return {"robot": model.robot_name, "config_hash": model.config_hash}
+
+def _split(total: int, chunk_size: int):
+    for start in range(0, total, chunk_size):
+        yield start, min(chunk_size, total - start)
+
+def generate_datasets(model, chunk_size: int = 10000, workers: int = None, seed: int = None) -> dict:
+    """Writes general, base circles and tool circles datasets measured on the 'real' model through model.measurement_model.
+
+    General poses are drawn by WorkspaceSampler, so they respect cartesian_limits and max_z_angle. If
+    model.pose_selection_candidates is set, they are the D-optimal subset of a candidate pool of that size.
+
+    Chunks are generated by a process pool and streamed to the dataset files (CSV or binary) in order.
+    """
+    workers = workers or model.workers
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    general_splits = list(_split(model.general_samples_number, chunk_size))
+    general_tasks = [(child, size) for child, (_, size) in zip(seeds[0].spawn(len(general_splits)), general_splits)]
+    circles_chunk = max(1, chunk_size//model.circle_points_number)
+    circle_splits = list(_split(model.circle_samples_number, circles_chunk))
+    base_tasks = [(child, start, size, BASE_CIRCLE_JOINT) for child, (start, size) in
+                  zip(seeds[1].spawn(len(circle_splits)), circle_splits)]
+    tool_tasks = [(child, start, size, TOOL_CIRCLE_JOINT) for child, (start, size) in
+                  zip(seeds[2].spawn(len(circle_splits)), circle_splits)]
+
+    rows = {}
+    metadata = dataset_metadata(model)
+    sampling = {"proposed": 0, "accepted": 0, "sampling_time": 0.0}
+    with mp.Pool(workers, initializer=_init_worker, initargs=(model,)) as pool:
+        window = 2*workers
+        # Nothing to select for an empty general dataset
+        if model.pose_selection_candidates and model.general_samples_number:
+            # Poses are planned on the nominal model, as they would be for the real robot
+            sampler = WorkspaceSampler(model, model.joint_limits_general_l, model.joint_limits_general_h, 'nominal', seeds[0])
+            candidates = sampler.sample(model.pose_selection_candidates)
+            # Redundant params would make every subset singular
+            step = max(1, len(candidates)//model.identifiability_poses_number) if model.identifiability_poses_number else 1
+            # The mask is used only for the selection, calibration computes its own from the dataset
+            mask = analyze_identifiability(model, candidates[::step], 'nominal', update_model=False)["identifiability_mask"]
+            selection = select_poses(model, candidates, model.general_samples_number, identifiability_mask=mask)
+            sampling.update(sampler.get_stats(), observability=selection["indices_selected"])
+            selected = candidates[selection["indices"]]
+            selected_chunks = np.array_split(selected, -(-len(selected)//chunk_size))
+            general_chunks = _bounded_imap(pool, _measure_chunk, zip(seeds[0].spawn(len(selected_chunks)), selected_chunks), window)
+        else:
+            general_chunks = _collect_sampling_stats(_bounded_imap(pool, _general_chunk, general_tasks, window), sampling)
+        rows[model.dataset_file] = write_dataset_stream(model.dataset_file, DATASET_HEADER, general_chunks, metadata)
+        rows[model.base_circles_dataset_file] = write_dataset_stream(model.base_circles_dataset_file, CIRCLES_DATASET_HEADER,
+                                                                     _bounded_imap(pool, _circles_chunk, base_tasks, window), metadata)
+        rows[model.tool_circles_dataset_file] = write_dataset_stream(model.tool_circles_dataset_file, CIRCLES_DATASET_HEADER,
+                                                                     _bounded_imap(pool, _circles_chunk, tool_tasks, window), metadata)
+    sampling["acceptance_rate"] = sampling["accepted"]/sampling["proposed"] if sampling["proposed"] else 0.0
+    # Summed over workers, i.e. throughput of a single sampler
+    sampling["samples_per_second"] = sampling["accepted"]/sampling["sampling_time"] if sampling["sampling_time"] else 0.0
+    return rows, sampling
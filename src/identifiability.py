@@ -0,0 +1,63 @@
+import numpy as np
+from identification import identification_jacobian, params_names, PARAMS_NUMBER
+
+def pivoted_qr_columns(r: np.ndarray, tolerance: float) -> np.ndarray:
+    """Column order of a Businger-Golub pivoted QR, stopped when the largest remaining column norm drops below tolerance.
+
+    Works on the triangular factor of the Jacobian, column norms and inner products are the same as for the Jacobian.
+    """
+    residual = r.copy()
+    remaining = list(range(r.shape[1]))
+    selected = []
+    first_norm = None
+    while remaining:
+        norms = np.linalg.norm(residual[:, remaining], axis=0)
+        best = int(np.argmax(norms))
+        if first_norm is None:
+            first_norm = norms[best]
+        if first_norm == 0 or norms[best] <= tolerance*first_norm:
+            break
+        column = remaining.pop(best)
+        direction = residual[:, column]/norms[best]
+        selected.append(column)
+        residual[:, remaining] -= np.outer(direction, direction @ residual[:, remaining])
+    return np.array(selected, dtype='int')
+
+def analyze_identifiability(model, angles: np.ndarray, type: str = 'estimated', tolerance: float = 1e-8,
+                            update_model: bool = True) -> dict:
+    """Finds identifiable params for a pose set, the mask is stored in model.identifiability_mask if update_model is set.
+
+    Jacobian columns are normalized before the rank-revealing QR, so parameter units do not affect the choice.
+    Null space vectors of the scaled Jacobian give the non-identifiable parameter combinations.
+    """
+    params, base_params, tool_params = model.get_model_params(type)
+    _, jac = identification_jacobian(params, base_params, tool_params, angles)
+    jac = jac[:, model.measurable_params_mask].reshape(-1, PARAMS_NUMBER)
+    norms = np.linalg.norm(jac, axis=0)
+    scaled = jac/np.where(norms > 0, norms, 1)
+    r = np.linalg.qr(scaled, mode='r')
+
+    selected = pivoted_qr_columns(r, tolerance)
+    mask = np.zeros(PARAMS_NUMBER, dtype='int')
+    mask[selected] = 1
+    _, singular_values, vt = np.linalg.svd(r)
+    # Fewer rows than params (or none at all) leave the missing singular values zero
+    singular_values = np.pad(singular_values, (0, PARAMS_NUMBER - singular_values.size))
+    # No column passes the tolerance e.g. for an all-zero Jacobian: empty selection, infinite condition number
+    selected_values = np.linalg.svd(r[:, np.sort(selected)], compute_uv=False) if selected.size else np.zeros(1)
+
+    names = params_names(model.nominal_dh)
+    combinations = []
+    for vector in vt[singular_values <= tolerance*singular_values[0]]:
+        significant = np.flatnonzero(np.abs(vector) > 0.1)
+        combinations.append({names[index]: float(vector[index]) for index in significant})
+
+    if update_model:
+        model.identifiability_mask = mask
+    return {"identifiability_mask": mask.tolist(),
+            "identifiable_number": int(mask.sum()),
+            "non_identifiable": [names[index] for index in np.flatnonzero(mask == 0)],
+            "non_identifiable_combinations": combinations,
+            "condition_number": float(selected_values[0]/selected_values[-1]) if selected_values[-1] > 0 else float('inf'),
+            "full_condition_number": float(singular_values[0]/singular_values[-1]) if singular_values[-1] > 0 else float('inf'),
+            "singular_values": singular_values.tolist()}
@@ -0,0 +1,207 @@
+import numpy as np
+from typing import Union
+from math_routines import pose_tf, pose_tf_batch
+from robotic_transformations import KinematicChain
+
+# Parameter vector layout: 6 links x [a, alpha, d/beta, theta_offset], then base and tool [x, y, z, rz, ry, rx]
+PARAMS_NUMBER = 36
+LINK_PARAMS_NUMBER = 4
+BASE_OFFSET = 24
+TOOL_OFFSET = 30
+
+def params_to_vector(dh: list, base_params: list, tool_params: list) -> np.ndarray:
+    vector = np.zeros(PARAMS_NUMBER, dtype='float')
+    for index, unit in enumerate(dh):
+        vector[index*LINK_PARAMS_NUMBER:(index + 1)*LINK_PARAMS_NUMBER] = unit[:LINK_PARAMS_NUMBER]
+    vector[BASE_OFFSET:TOOL_OFFSET] = base_params
+    vector[TOOL_OFFSET:] = tool_params
+    return vector
+
+def params_names(dh_template: list) -> list:
+    names = []
+    for index, unit in enumerate(dh_template):
+        names += [f"a{index + 1}", f"alpha{index + 1}", f"{'beta' if unit[-1] else 'd'}{index + 1}", f"theta{index + 1}"]
+    names += [f"base_{name}" for name in ("x", "y", "z", "rz", "ry", "rx")]
+    names += [f"tool_{name}" for name in ("x", "y", "z", "rz", "ry", "rx")]
+    return names
+
+def vector_to_params(vector: np.ndarray, dh_template: list):
+    # Parallel axis flags are not identified and are copied from the template
+    dh = []
+    for index, unit in enumerate(dh_template):
+        link = [float(value) for value in vector[index*LINK_PARAMS_NUMBER:(index + 1)*LINK_PARAMS_NUMBER]]
+        dh.append(link + [unit[-1]])
+    base_params = [float(value) for value in vector[BASE_OFFSET:TOOL_OFFSET]]
+    tool_params = [float(value) for value in vector[TOOL_OFFSET:]]
+    return dh, base_params, tool_params
+
+def _rotation_column(jac: np.ndarray, column: int, axis: np.ndarray, origin: np.ndarray, end_point: np.ndarray):
+    jac[:, :3, column] = np.cross(axis, end_point - origin)
+    jac[:, 3:, column] = axis
+
+def _translation_column(jac: np.ndarray, column: int, axis: np.ndarray):
+    jac[:, :3, column] = axis
+
+def identification_jacobian(dh: list, base_params: list, tool_params: list, angles: Union[np.ndarray, list]):
+    """Returns end effector transforms (N, 4, 4) and the pose Jacobian (N, 6, 36) w.r.t. the parameter vector.
+
+    Jacobian rows are [dx, dy, dz, wx, wy, wz] in the base (world) frame, every column is the twist
+    produced by the corresponding elementary transform of the chain.
+    """
+    angles = np.atleast_2d(np.asarray(angles, dtype='float'))
+    n = angles.shape[0]
+    base_tf = pose_tf(base_params)
+    tool_tf = pose_tf(tool_params)
+
+    frames = KinematicChain(dh, base_tf, tool_tf).frames(angles)
+    end_tf = frames[:, -1]
+    end_point = end_tf[:, :3, 3]
+
+    jac = np.zeros((n, 6, PARAMS_NUMBER), dtype='float')
+    for index, unit in enumerate(dh):
+        prev_tf, next_tf = frames[:, index], frames[:, index + 1]
+        column = index*LINK_PARAMS_NUMBER
+        q = unit[3] + angles[:, index, None]
+        # x axis after the joint rotation, common for DH and Hayati links
+        x_axis = np.cos(q)*prev_tf[:, :3, 0] + np.sin(q)*prev_tf[:, :3, 1]
+        _translation_column(jac, column, x_axis)
+        _rotation_column(jac, column + 1, x_axis, next_tf[:, :3, 3], end_point)
+        if unit[-1] == 0:
+            _translation_column(jac, column + 2, prev_tf[:, :3, 2])
+        else:
+            _rotation_column(jac, column + 2, next_tf[:, :3, 1], next_tf[:, :3, 3], end_point)
+        _rotation_column(jac, column + 3, prev_tf[:, :3, 2], prev_tf[:, :3, 3], end_point)
+
+    # Base: trans @ z_rot @ y_rot @ x_rot, all rotations are about the base origin
+    base_origin = np.broadcast_to(base_tf[:3, 3], (n, 3))
+    for axis_index in range(3):
+        _translation_column(jac, BASE_OFFSET + axis_index, np.broadcast_to(np.eye(3)[axis_index], (n, 3)))
+    rz = base_params[3]
+    _rotation_column(jac, BASE_OFFSET + 3, np.broadcast_to([0.0, 0.0, 1.0], (n, 3)), base_origin, end_point)
+    _rotation_column(jac, BASE_OFFSET + 4, np.broadcast_to([-np.sin(rz), np.cos(rz), 0.0], (n, 3)), base_origin, end_point)
+    _rotation_column(jac, BASE_OFFSET + 5, np.broadcast_to(base_tf[:3, 0], (n, 3)), base_origin, end_point)
+
+    # Tool: same decomposition applied after the flange, rotations are about the end point
+    flange_tf = frames[:, -2]
+    for axis_index in range(3):
+        _translation_column(jac, TOOL_OFFSET + axis_index, flange_tf[:, :3, axis_index])
+    rz = tool_params[3]
+    jac[:, 3:, TOOL_OFFSET + 3] = flange_tf[:, :3, 2]
+    jac[:, 3:, TOOL_OFFSET + 4] = -np.sin(rz)*flange_tf[:, :3, 0] + np.cos(rz)*flange_tf[:, :3, 1]
+    jac[:, 3:, TOOL_OFFSET + 5] = end_tf[:, :3, 0]
+    return end_tf, jac
+
+def measured_transforms(poses: np.ndarray) -> np.ndarray:
+    # (N, 6) poses [x, y, z, rz, ry, rx] -> (N, 4, 4), same convention as trans @ z_rot @ y_rot @ x_rot
+    return pose_tf_batch(np.atleast_2d(poses))
+
+def pose_residuals(end_tf: np.ndarray, measured_tf: np.ndarray) -> np.ndarray:
+    # (N, 6) residuals [position error, small angle rotation error], both in the base frame
+    residuals = np.empty((end_tf.shape[0], 6), dtype='float')
+    residuals[:, :3] = measured_tf[:, :3, 3] - end_tf[:, :3, 3]
+    rot_err = measured_tf[:, :3, :3] @ end_tf[:, :3, :3].transpose(0, 2, 1)
+    residuals[:, 3] = 0.5*(rot_err[:, 2, 1] - rot_err[:, 1, 2])
+    residuals[:, 4] = 0.5*(rot_err[:, 0, 2] - rot_err[:, 2, 0])
+    residuals[:, 5] = 0.5*(rot_err[:, 1, 0] - rot_err[:, 0, 1])
+    return residuals
+
+def residual_norm(model, angles: np.ndarray, measured_poses: np.ndarray, type: str = 'estimated') -> float:
+    # RMS of the measurable residuals, the same value levenberg_marquardt stores in model.norm
+    residuals = pose_residuals(model.get_transition_matrices(angles, type), measured_transforms(measured_poses))
+    return float(np.sqrt(np.mean(residuals[:, model.measurable_params_mask]**2)))
+
+def normal_equations(vector: np.ndarray, dh_template: list, angles: np.ndarray, measured_tf: np.ndarray,
+                     rows: np.ndarray, columns: np.ndarray):
+    """Returns J^T J, J^T r and the residual sum of squares for the selected rows/columns of the Jacobian."""
+    dh, base_params, tool_params = vector_to_params(vector, dh_template)
+    end_tf, jac = identification_jacobian(dh, base_params, tool_params, angles)
+    residuals = pose_residuals(end_tf, measured_tf)[:, rows].reshape(-1)
+    jac = jac[:, rows][:, :, columns].reshape(-1, np.count_nonzero(columns))
+    return jac.T @ jac, jac.T @ residuals, float(residuals @ residuals)
+
+def accumulate_normal_equations(vector: np.ndarray, dh_template: list, angles: np.ndarray, measured_poses: np.ndarray,
+                                rows: np.ndarray, columns: np.ndarray, chunk_size: int):
+    """normal_equations summed over chunks of the dataset, memory does not depend on the dataset size.
+
+    Works with memory-mapped datasets, only one chunk of rows is read and converted at a time.
+    """
+    size = np.count_nonzero(columns)
+    jtj = np.zeros((size, size), dtype='float')
+    jtr = np.zeros(size, dtype='float')
+    sse = 0.0
+    for start in range(0, angles.shape[0], chunk_size):
+        measured_tf = measured_transforms(measured_poses[start:start + chunk_size])
+        chunk_jtj, chunk_jtr, chunk_sse = normal_equations(vector, dh_template, np.asarray(angles[start:start + chunk_size]),
+                                                           measured_tf, rows, columns)
+        jtj += chunk_jtj
+        jtr += chunk_jtr
+        sse += chunk_sse
+    return jtj, jtr, sse
+
+def damped_least_squares(model, evaluate, residuals_number: int, max_iterations: int = 100, max_lm_koef: float = 1e10) -> dict:
+    """Levenberg-Marquardt loop over the estimated params of the model.
+
+    evaluate(vector) returns J^T J, J^T r and the residual sum of squares for the identifiable columns. The damping
+    factor starts from model.lm_koef and is adapted after every step, iterations stop when the relative decrease
+    of the residual norm is lower than model.koef.
+    """
+    columns = model.identifiability_mask == 1
+    vector = model.get_params_vector('estimated')
+    jtj, jtr, sse = evaluate(vector)
+    lm_koef = model.lm_koef
+    model.prev_norm = model.norm = float(np.sqrt(sse/residuals_number))
+    history = [model.norm]
+    converged = False
+    iteration = 0
+    while iteration < max_iterations and not converged:
+        iteration += 1
+        damped = jtj + lm_koef*np.diag(np.diag(jtj))
+        try:
+            delta = np.linalg.solve(damped, jtr)
+        except np.linalg.LinAlgError:
+            delta = np.linalg.lstsq(damped, jtr, rcond=None)[0]
+        candidate = vector.copy()
+        candidate[columns] += delta
+        new_jtj, new_jtr, new_sse = evaluate(candidate)
+        if new_sse < sse:
+            vector, jtj, jtr, sse = candidate, new_jtj, new_jtr, new_sse
+            lm_koef = max(lm_koef/10, 1e-12)
+            model.prev_norm, model.norm = model.norm, float(np.sqrt(sse/residuals_number))
+            history.append(model.norm)
+            converged = model.prev_norm - model.norm < model.koef*model.prev_norm
+        else:
+            lm_koef *= 10
+            # Damping grows only while no step decreases the norm, i.e. the minimum is reached
+            converged = lm_koef > max_lm_koef
+    model.set_params_vector('estimated', vector)
+    return {"iterations": iteration, "converged": bool(converged), "norm": model.norm, "lm_koef": lm_koef,
+            "norm_history": history}
+
+def levenberg_marquardt(model, angles: np.ndarray, measured_poses: np.ndarray, max_iterations: int = 100) -> dict:
+    """Identifies estimated_dh/base/tool params of the model from measured end effector poses, whole dataset in memory."""
+    angles = np.atleast_2d(np.asarray(angles, dtype='float'))
+    measured_tf = measured_transforms(measured_poses)
+    rows = model.measurable_params_mask
+    columns = model.identifiability_mask == 1
+    evaluate = lambda vector: normal_equations(vector, model.nominal_dh, angles, measured_tf, rows, columns)
+    return damped_least_squares(model, evaluate, angles.shape[0]*len(rows), max_iterations)
+
+def levenberg_marquardt_streaming(model, angles: np.ndarray, measured_poses: np.ndarray, max_iterations: int = 100,
+                                  chunk_size: int = None) -> dict:
+    """Same as levenberg_marquardt, but J^T J and J^T r are accumulated over chunks of model.chunk_size rows."""
+    rows = model.measurable_params_mask
+    columns = model.identifiability_mask == 1
+    chunk_size = chunk_size or model.chunk_size
+    evaluate = lambda vector: accumulate_normal_equations(vector, model.nominal_dh, angles, measured_poses, rows, columns, chunk_size)
+    report = damped_least_squares(model, evaluate, angles.shape[0]*len(rows), max_iterations)
+    report["chunk_size"] = chunk_size
+    return report
+
+def transforms_to_poses(tfs: np.ndarray) -> np.ndarray:
+    # (N, 4, 4) -> (N, 6) poses [x, y, z, rz, ry, rx], inverse of measured_transforms
+    poses = np.empty((tfs.shape[0], 6), dtype='float')
+    poses[:, :3] = tfs[:, :3, 3]
+    poses[:, 3] = np.arctan2(tfs[:, 1, 0], tfs[:, 0, 0])
+    poses[:, 4] = np.arctan2(-tfs[:, 2, 0], np.hypot(tfs[:, 0, 0], tfs[:, 1, 0]))
+    poses[:, 5] = np.arctan2(tfs[:, 2, 1], tfs[:, 2, 2])
+    return poses
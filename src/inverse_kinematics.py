@@ -0,0 +1,91 @@
+import numpy as np
+from typing import Union
+from identification import measured_transforms, pose_residuals
+
+def geometric_jacobian(chain, angles: np.ndarray):
+    """End effector transforms (N, 4, 4) and geometric Jacobians (N, 6, 6) in the base frame.
+
+    Every joint rotates about the z axis of the previous frame, for DH and Hayati links alike.
+    """
+    frames = chain.frames(np.atleast_2d(angles))
+    n, joints_number = frames.shape[0], frames.shape[1] - 2
+    axes = frames[:, :joints_number, :3, 2]
+    origins = frames[:, :joints_number, :3, 3]
+    end_tf = frames[:, -1]
+    jac = np.empty((n, 6, joints_number), dtype='float')
+    jac[:, :3] = np.cross(axes, end_tf[:, None, :3, 3] - origins).transpose(0, 2, 1)
+    jac[:, 3:] = axes.transpose(0, 2, 1)
+    return end_tf, jac
+
+class InverseKinematics:
+    """Batched damped least squares IK for a model type ('nominal', 'real' or 'estimated').
+
+    Every target keeps its own damping factor: it is decreased after a step which reduces the pose error and
+    increased (the step is rejected) otherwise. Converged targets are dropped from the active batch.
+    """
+    def __init__(self, model, type: str = 'estimated', damping: float = 1e-3, tolerance: float = 1e-10,
+                 max_iterations: int = 100, joint_limits: tuple = None):
+        self.model = model
+        self.type = type
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.joint_limits = joint_limits
+        self.iterations = 0
+
+    def _errors(self, chain, angles: np.ndarray, targets: np.ndarray):
+        end_tf, jac = geometric_jacobian(chain, angles)
+        errors = pose_residuals(end_tf, targets)
+        return errors, np.sum(errors**2, axis=1), jac
+
+    def solve(self, targets: np.ndarray, initial_angles: Union[np.ndarray, list, None] = None) -> dict:
+        """targets are (N, 4, 4) transforms or (N, 6) poses [x, y, z, rz, ry, rx]."""
+        targets = np.asarray(targets, dtype='float')
+        if targets.shape[-1] == 6 and targets.ndim == 2:
+            targets = measured_transforms(targets)
+        n = targets.shape[0]
+        if initial_angles is None:
+            initial_angles = (np.asarray(self.model.joint_limits_general_l) + np.asarray(self.model.joint_limits_general_h))/2
+        angles = np.array(np.broadcast_to(initial_angles, (n, 6)), dtype='float')
+        chain = self.model.get_chain(self.type)
+
+        errors, costs, jac = self._errors(chain, angles, targets)
+        damping = np.full(n, self.damping)
+        active = np.flatnonzero(costs > self.tolerance**2)
+        iteration = 0
+        while active.size and iteration < self.max_iterations:
+            iteration += 1
+            j = jac[active]
+            jjt = j @ j.transpose(0, 2, 1) + (damping[active]**2)[:, None, None]*np.eye(6)
+            step = np.einsum('nji,nj->ni', j, np.linalg.solve(jjt, errors[active][..., None])[..., 0])
+            candidate = angles[active] + step
+            if self.joint_limits is not None:
+                candidate = np.clip(candidate, self.joint_limits[0], self.joint_limits[1])
+            new_errors, new_costs, new_jac = self._errors(chain, candidate, targets[active])
+
+            improved = new_costs < costs[active]
+            accepted = active[improved]
+            angles[accepted] = candidate[improved]
+            errors[accepted], costs[accepted], jac[accepted] = new_errors[improved], new_costs[improved], new_jac[improved]
+            damping[accepted] = np.maximum(damping[accepted]/2, 1e-9)
+            damping[active[~improved]] *= 4
+            active = active[(costs[active] > self.tolerance**2) & (damping[active] < 1e6)]
+        self.iterations = iteration
+        return {"angles": angles, "converged": costs <= self.tolerance**2, "errors": np.sqrt(costs), "iterations": iteration}
+
+    def solve_trajectory(self, targets: np.ndarray, initial_angles: Union[np.ndarray, list]) -> dict:
+        """Sequential targets, every solve starts from the previous solution (a few iterations per point)."""
+        targets = np.asarray(targets, dtype='float')
+        if targets.shape[-1] == 6 and targets.ndim == 2:
+            targets = measured_transforms(targets)
+        angles = np.empty((targets.shape[0], 6), dtype='float')
+        converged = np.empty(targets.shape[0], dtype='bool')
+        errors = np.empty(targets.shape[0], dtype='float')
+        iterations = 0
+        current = np.asarray(initial_angles, dtype='float')
+        for index in range(targets.shape[0]):
+            result = self.solve(targets[index:index + 1], current)
+            current = angles[index] = result["angles"][0]
+            converged[index], errors[index] = result["converged"][0], result["errors"][0]
+            iterations += result["iterations"]
+        return {"angles": angles, "converged": converged, "errors": errors, "iterations": iterations}
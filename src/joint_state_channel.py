@@ -0,0 +1,106 @@
+import numpy as np
+import time
+from multiprocessing import shared_memory
+from typing import Union
+
+# int64 header: number of written states, capacity, joints number
+HEADER_SIZE = 3
+
+class JointStateChannel:
+    """Single writer, many readers ring buffer of timestamped float64 joint states in shared memory.
+
+    Every slot is guarded by its own sequence number (seqlock): the writer makes it odd before changing the slot
+    and even after, a reader retries if the number was odd or changed while it copied the slot. Readers take
+    no locks and never see a torn state. State numbers start from 1, state k is stored in slot (k - 1) % capacity
+    with an even sequence 2k.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        self.capacity, self.joints_number = int(header[1]), int(header[2])
+        self.header = header
+        self.sequences = np.ndarray((self.capacity,), dtype=np.int64, buffer=shm.buf, offset=HEADER_SIZE*8)
+        self.slots = np.ndarray((self.capacity, self.joints_number + 1), dtype=np.float64, buffer=shm.buf,
+                                offset=(HEADER_SIZE + self.capacity)*8)
+
+    @classmethod
+    def create(cls, capacity: int = 256, joints_number: int = 6):
+        shm = shared_memory.SharedMemory(create=True, size=(HEADER_SIZE + capacity + capacity*(joints_number + 1))*8)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[:] = [0, capacity, joints_number]
+        np.ndarray((capacity,), dtype=np.int64, buffer=shm.buf, offset=HEADER_SIZE*8)[:] = 0
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __reduce__(self):
+        # Other processes attach to the same block by name
+        return (JointStateChannel.attach, (self.name,))
+
+    @property
+    def written(self) -> int:
+        return int(self.header[0])
+
+    def write(self, angles: Union[np.ndarray, list], timestamp: float = None):
+        number = int(self.header[0]) + 1
+        slot = (number - 1) % self.capacity
+        self.sequences[slot] = 2*number - 1
+        self.slots[slot, 0] = time.time() if timestamp is None else timestamp
+        self.slots[slot, 1:] = angles
+        self.sequences[slot] = 2*number
+        self.header[0] = number
+
+    def _read_slot(self, slot: int, retries: int = 100):
+        for _ in range(retries):
+            sequence = int(self.sequences[slot])
+            if sequence & 1:
+                continue
+            state = self.slots[slot].copy()
+            if int(self.sequences[slot]) == sequence:
+                return sequence//2, state
+        return None, None
+
+    def latest(self, timeout: float = 1.0):
+        """(state number, timestamp, angles) of the newest state or None if nothing was written yet.
+        Raises TimeoutError if no consistent state could be read for timeout seconds, e.g. the writer died mid-write."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            number = int(self.header[0])
+            if number == 0:
+                return None
+            state_number, state = self._read_slot((number - 1) % self.capacity)
+            if state is not None:
+                return state_number, state[0], state[1:]
+        raise TimeoutError(f"No consistent joint state could be read from {self.name} in {timeout} s")
+
+    def read_since(self, state_number: int):
+        """States newer than state_number still kept in the ring: (numbers, timestamps, (M, joints) angles).
+        States overwritten before they were read are skipped, so slow consumers lose data instead of blocking the writer."""
+        number = int(self.header[0])
+        numbers, states = [], []
+        for k in range(max(state_number + 1, number - self.capacity + 1), number + 1):
+            read_number, state = self._read_slot((k - 1) % self.capacity)
+            if read_number == k:
+                numbers.append(k)
+                states.append(state)
+        states = np.array(states).reshape(-1, self.joints_number + 1)
+        return np.array(numbers, dtype='int'), states[:, 0], states[:, 1:]
+
+    def close(self):
+        self.header = self.sequences = self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
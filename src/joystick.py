@@ -1,5 +1,11 @@
 import pygame
 import sys
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def get_font(size: int) -> pygame.font.Font:
+    # Fonts are loaded once per size, pygame.font must be initialized
+    return pygame.font.Font(None, size)
 
 class LinearJoystick:
     def __init__(self, x, y, width, height, limits, joystick_id):
@@ -21,14 +27,18 @@ class LinearJoystick:
         normalized_value = (self.value - self.lower_limit) / value_range
         knob_x = self.rect.left + (normalized_value * self.rect.width)
         self.knob_rect.centerx = knob_x
+        self.dirty = True
+
+    def dynamic_rect(self) -> pygame.Rect:
+        # Area which the knob and the value text can cover at any value
+        return pygame.Rect(self.rect.left - 30, self.rect.top - 27, self.rect.width + 70, self.rect.height + 28)
         
-    def draw(self, surface):
+    def draw_static(self, surface, font):
         # Draw track
         pygame.draw.rect(surface, (100, 100, 100), self.rect)
         pygame.draw.rect(surface, (50, 50, 50), self.rect, 2)
         
         # Draw limits labels
-        font = pygame.font.Font(None, 24)
         lower_text = font.render(f"{self.lower_limit:.1f}", True, (200, 200, 200))
         upper_text = font.render(f"{self.upper_limit:.1f}", True, (200, 200, 200))
         surface.blit(lower_text, (self.rect.left - 55, self.rect.centery - 10))
@@ -37,7 +47,8 @@ class LinearJoystick:
         # Draw ID label
         id_text = font.render(f"J{self.joystick_id+1}", True, (255, 255, 255))
         surface.blit(id_text, (self.rect.centerx - 10, self.rect.top - 55))
-        
+
+    def draw_dynamic(self, surface, font):
         # Draw knob
         pygame.draw.rect(surface, (200, 50, 50), self.knob_rect)
         pygame.draw.rect(surface, (255, 255, 255), self.knob_rect, 2)
@@ -45,6 +56,12 @@ class LinearJoystick:
         # Draw current value above knob
         value_text = font.render(f"{self.value:.2f}", True, (255, 255, 0))
         surface.blit(value_text, (self.knob_rect.centerx - 20, self.knob_rect.top - 25))
+        self.dirty = False
+
+    def draw(self, surface, font=None):
+        font = font or get_font(24)
+        self.draw_static(surface, font)
+        self.draw_dynamic(surface, font)
         
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -62,6 +79,7 @@ class LinearJoystick:
             # Calculate value based on position and limits
             normalized_pos = (knob_x - self.rect.left) / self.rect.width
             self.value = self.lower_limit + (normalized_pos * (self.upper_limit - self.lower_limit))
+            self.dirty = True
             
     def get_value(self):
         return self.value
@@ -85,8 +103,12 @@ class JointJoysticks:
                 joystick_i.value = 1.57
                 joystick_i.update_knob_position_from_value()
             self.joysticks.append(joystick_i)
-        self.font = pygame.font.Font(None, 36)
-        self.big_font = pygame.font.Font(None, 48)
+        self.font = get_font(36)
+        self.big_font = get_font(48)
+        self.small_font = get_font(24)
+        # Tracks and labels are drawn once, frames only redraw the changed areas over this surface
+        self.background = None
+        self.value_texts = [None]*len(self.joysticks)
 
         # #Create another 6 joysticks
         # for i in range(6):
@@ -107,34 +129,59 @@ class JointJoysticks:
     #     id_text = self.big_font.render(f"Real", True, (255, 255, 255))
     #     surface.blit(id_text, (900, 25))
         
-    def draw_joint_joysticks(self):
+    def draw_background(self):
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.background.fill((30, 30, 30))
+        #self.draw_labels(self.background)
+        for joystick in self.joysticks:
+            joystick.draw_static(self.background, self.small_font)
+        self.value_texts = [None]*len(self.joysticks)
+
+    def value_text_rect(self, index: int) -> pygame.Rect:
+        x_offset, i_offset = (800, 6) if index > 5 else (0, 0)
+        return pygame.Rect(600 + x_offset, 100 + (index - i_offset) * 30, 250, 30)
+
+    def draw_joint_joysticks(self) -> bool:
+        """Handles events and redraws the changed parts of the window. Returns False when the window was closed"""
+        running = True
+        full_redraw = self.background is None
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.WINDOWEXPOSED:
+                full_redraw = True
             for joystick in self.joysticks:
                 joystick.handle_event(event)
-        
-        self.screen.fill((30, 30, 30))
-        
-        # Draw all joysticks
-        #self.draw_labels(self.screen)
+
+        if self.background is None:
+            self.draw_background()
+        if full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            self.value_texts = [None]*len(self.joysticks)
+
+        dirty_rects = []
         for joystick in self.joysticks:
-            joystick.draw(self.screen)
-        
-        # Display all current values
-        current_values = self.get_all_joystick_values()
-        y_offset = 100
-        x_offset = 0
-        i_offset = 0
-        for i, value in enumerate(current_values):
-            value_text = self.font.render(f"Joint {i+1 - i_offset}: {value:.2f}", True, (255, 255, 255))
-            self.screen.blit(value_text, (600 + x_offset, y_offset + (i - i_offset) * 30))
-            if(i == 5):
-                x_offset = 800
-                i_offset = 6
+            if joystick.dirty or full_redraw:
+                area = joystick.dynamic_rect()
+                self.screen.blit(self.background, area, area)
+                joystick.draw_dynamic(self.screen, self.small_font)
+                dirty_rects.append(area)
 
-        pygame.display.flip()
+        # Display current values, a row is rendered only when its text changes
+        for i, value in enumerate(self.get_all_joystick_values()):
+            text = f"Joint {i+1 - (6 if i > 5 else 0)}: {value:.2f}"
+            if text != self.value_texts[i]:
+                area = self.value_text_rect(i)
+                self.screen.blit(self.background, area, area)
+                self.screen.blit(self.font.render(text, True, (255, 255, 255)), area)
+                self.value_texts[i] = text
+                dirty_rects.append(area)
 
+        if full_redraw:
+            pygame.display.flip()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        return running
 
     def get_all_joystick_values(self):
         """Returns a list of current values from all joysticks"""
@@ -152,14 +199,15 @@ class JointJoysticks:
         """Returns a list of limits for all joysticks"""
         return [joystick.limits for joystick in self.joysticks]
 
-def joystick_process(upper_limit: float, lower_limit: float, angles_values:list, running: int, name:str):
+def joystick_process(upper_limit: float, lower_limit: float, channel, running: int, name:str):
     joints_joysticks = JointJoysticks(upper_limit, lower_limit, name)
-    while(running):
-        joints_joysticks.draw_joint_joysticks()
+    while(running.value):
+        if not joints_joysticks.draw_joint_joysticks():
+            running.value = 0
         joints_joysticks.clock.tick(60)
-        res = joints_joysticks.get_all_joystick_values()
-        for i in range(6):
-            angles_values[i] = res[i]
+        channel.write(joints_joysticks.get_all_joystick_values())
+    pygame.quit()
+    get_font.cache_clear()
 
 # # Function that uses the joystick values
 # def process_joystick_data(joysticks):
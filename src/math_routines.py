@@ -2,34 +2,101 @@ import numpy as np
 from math import cos, sin, pi, sqrt, atan2, asin, log10, acos, copysign
 from typing import Union
 
+def _rot_batch(angles: Union[np.ndarray, list], axis: int) -> np.ndarray:
+    # (N,) angles -> (N, 4, 4) rotations about the x (0), y (1) or z (2) axis
+    angles = np.asarray(angles, dtype='float')
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    mats = np.zeros(angles.shape + (4, 4), dtype='float')
+    s, c = np.sin(angles), np.cos(angles)
+    mats[..., axis, axis] = 1
+    mats[..., 3, 3] = 1
+    mats[..., i, i] = c
+    mats[..., i, j] = -s
+    mats[..., j, i] = s
+    mats[..., j, j] = c
+    return mats
+
+def x_rot_batch(angles: Union[np.ndarray, list]) -> np.ndarray:
+    return _rot_batch(angles, 0)
+
+def y_rot_batch(angles: Union[np.ndarray, list]) -> np.ndarray:
+    return _rot_batch(angles, 1)
+
+def z_rot_batch(angles: Union[np.ndarray, list]) -> np.ndarray:
+    return _rot_batch(angles, 2)
+
+def trans_batch(vectors: np.ndarray) -> np.ndarray:
+    # (N, 3) translations -> (N, 4, 4)
+    vectors = np.asarray(vectors, dtype='float')
+    mats = np.zeros(vectors.shape[:-1] + (4, 4), dtype='float')
+    mats[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+    mats[..., :3, 3] = vectors[..., :3]
+    return mats
+
+def arbitrary_axis_rot_batch(axes: np.ndarray, angles: Union[np.ndarray, list]) -> np.ndarray:
+    # Rodrigues formula: (N, 3) or (3,) unit axes and (N,) angles -> (N, 3, 3)
+    axes = np.asarray(axes, dtype='float')
+    angles = np.asarray(angles, dtype='float')
+    s, c = np.sin(angles)[..., None, None], np.cos(angles)[..., None, None]
+    cross = np.zeros(np.broadcast_shapes(axes.shape[:-1], angles.shape) + (3, 3), dtype='float')
+    x, y, z = axes[..., 0], axes[..., 1], axes[..., 2]
+    cross[..., 0, 1], cross[..., 0, 2] = -z, y
+    cross[..., 1, 0], cross[..., 1, 2] = z, -x
+    cross[..., 2, 0], cross[..., 2, 1] = -y, x
+    return c*np.eye(3) + s*cross + (1 - c)*(axes[..., :, None]*axes[..., None, :])
+
+def pose_tf_batch(poses: np.ndarray) -> np.ndarray:
+    # (N, 6) poses [x, y, z, rz, ry, rx] -> (N, 4, 4) trans @ z_rot @ y_rot @ x_rot in closed form
+    poses = np.asarray(poses, dtype='float')
+    sz, cz = np.sin(poses[..., 3]), np.cos(poses[..., 3])
+    sy, cy = np.sin(poses[..., 4]), np.cos(poses[..., 4])
+    sx, cx = np.sin(poses[..., 5]), np.cos(poses[..., 5])
+    tfs = np.zeros(poses.shape[:-1] + (4, 4), dtype='float')
+    tfs[..., 0, 0] = cz*cy
+    tfs[..., 0, 1] = cz*sy*sx - sz*cx
+    tfs[..., 0, 2] = cz*sy*cx + sz*sx
+    tfs[..., 1, 0] = sz*cy
+    tfs[..., 1, 1] = sz*sy*sx + cz*cx
+    tfs[..., 1, 2] = sz*sy*cx - cz*sx
+    tfs[..., 2, 0] = -sy
+    tfs[..., 2, 1] = cy*sx
+    tfs[..., 2, 2] = cy*cx
+    tfs[..., :3, 3] = poses[..., :3]
+    tfs[..., 3, 3] = 1
+    return tfs
+
 def x_rot (angle: Union[int, float]) -> np.ndarray:
+    s, c = sin(angle), cos(angle)
     mat = np.array([[1, 0, 0, 0],
-                    [0, cos(angle), -sin(angle), 0],
-                    [0, sin(angle), cos(angle), 0],
+                    [0, c, -s, 0],
+                    [0, s, c, 0],
                     [0, 0, 0, 1]],dtype='float')
 
     return mat
 
 def y_rot(angle: Union[int, float]) -> np.ndarray:
-    mat = np.array([[cos(angle), 0, sin(angle), 0],
+    s, c = sin(angle), cos(angle)
+    mat = np.array([[c, 0, s, 0],
                     [0, 1, 0, 0],
-                    [-sin(angle), 0, cos(angle), 0],
+                    [-s, 0, c, 0],
                     [0, 0, 0, 1]],dtype='float')
     return mat
 
 def z_rot(angle: Union[int, float]) -> np.ndarray:
-    mat = np.array([[cos(angle), -sin(angle), 0, 0],
-                    [sin(angle), cos(angle), 0, 0],
+    s, c = sin(angle), cos(angle)
+    mat = np.array([[c, -s, 0, 0],
+                    [s, c, 0, 0],
                     [0, 0, 1, 0],
                     [0, 0, 0, 1]],dtype='float')
     return mat
 
 def arbitrary_axis_rot(axis: np.ndarray, angle: float) -> np.ndarray:
-    nu = 1 - cos(angle)
+    s, c = sin(angle), cos(angle)
+    nu = 1 - c
     x, y, z = axis
-    mat = np.array([[cos(angle)+(nu*(x**2)),  (nu*x*y)-(sin(angle)*z), (nu*x*z)+(sin(angle)*y)],
-                    [(nu*y*x)+(sin(angle)*z), cos(angle)+(nu*(y**2)),  (nu*y*z)-(sin(angle)*x)],
-                    [(nu*z*x)-(sin(angle)*y), (nu*z*y)+(sin(angle)*x), cos(angle)+(nu*(z**2))]], dtype='float')
+    mat = np.array([[c+(nu*(x**2)),  (nu*x*y)-(s*z), (nu*x*z)+(s*y)],
+                    [(nu*y*x)+(s*z), c+(nu*(y**2)),  (nu*y*z)-(s*x)],
+                    [(nu*z*x)-(s*y), (nu*z*y)+(s*x), c+(nu*(z**2))]], dtype='float')
     return mat
 
 def trans(vector: np.ndarray) -> np.ndarray:
@@ -37,4 +104,16 @@ def trans(vector: np.ndarray) -> np.ndarray:
                     [0, 1, 0, vector[1]],
                     [0, 0, 1, vector[2]],
                     [0, 0, 0, 1]],dtype='float')
-    return mat
\ No newline at end of file
+    return mat
+
+def pose_tf(params: Union[np.ndarray, list]) -> np.ndarray:
+    # [x, y, z, rz, ry, rx] -> trans @ z_rot @ y_rot @ x_rot, same closed form as pose_tf_batch
+    x, y, z, rz, ry, rx = params
+    sz, cz = sin(rz), cos(rz)
+    sy, cy = sin(ry), cos(ry)
+    sx, cx = sin(rx), cos(rx)
+    mat = np.array([[cz*cy, cz*sy*sx - sz*cx, cz*sy*cx + sz*sx, x],
+                    [sz*cy, sz*sy*sx + cz*cx, sz*sy*cx - cz*sx, y],
+                    [-sy, cy*sx, cy*cx, z],
+                    [0, 0, 0, 1]], dtype='float')
+    return mat
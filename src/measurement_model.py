@@ -0,0 +1,118 @@
+import numpy as np
+from typing import Union
+from math_routines import arbitrary_axis_rot_batch, pose_tf_batch
+from identification import transforms_to_poses
+
+def rotate_orientations(poses: np.ndarray, rotation_vectors: np.ndarray):
+    """Applies small base frame rotations (N, 3 rotation vectors) to the [rz, ry, rx] angles of poses in place.
+
+    The error is a rotation of the measured frame, so its size does not depend on the Euler angles, unlike noise
+    added to the angles themselves, which is amplified near ry = +-pi/2.
+    """
+    angles = np.linalg.norm(rotation_vectors, axis=1)
+    moved = angles > 0
+    if not np.any(moved):
+        return
+    rotations = arbitrary_axis_rot_batch(rotation_vectors[moved]/angles[moved, None], angles[moved])
+    tfs = pose_tf_batch(poses[moved])
+    tfs[:, :3, :3] = rotations @ tfs[:, :3, :3]
+    poses[moved, 3:] = transforms_to_poses(tfs)[:, 3:]
+
+class IsotropicNoise:
+    """Gaussian noise of the measured position and a Gaussian rotation vector error of the measured orientation."""
+    def __init__(self, position_std: float = 0.0, orientation_std: float = 0.0):
+        self.position_std = position_std
+        self.orientation_std = orientation_std
+
+    def apply(self, angles: np.ndarray, poses: np.ndarray, rng: np.random.Generator):
+        poses[:, :3] += rng.normal(0, self.position_std, (poses.shape[0], 3))
+        rotate_orientations(poses, rng.normal(0, self.orientation_std, (poses.shape[0], 3)))
+        return angles, poses
+
+class TrackerNoise:
+    """Laser tracker errors: Gaussian range, azimuth and elevation errors in the spherical frame of the tracker.
+
+    range_ppm adds the distance proportional part of the range error, the orientation of a 6D probe gets
+    an isotropic rotation error with orientation_std per axis.
+    """
+    def __init__(self, tracker_position: list, range_std: float = 0.0, azimuth_std: float = 0.0, elevation_std: float = 0.0,
+                 range_ppm: float = 0.0, orientation_std: float = 0.0):
+        self.tracker_position = np.asarray(tracker_position, dtype='float')
+        self.range_std = range_std
+        self.azimuth_std = azimuth_std
+        self.elevation_std = elevation_std
+        self.range_ppm = range_ppm
+        self.orientation_std = orientation_std
+
+    def apply(self, angles: np.ndarray, poses: np.ndarray, rng: np.random.Generator):
+        n = poses.shape[0]
+        relative = poses[:, :3] - self.tracker_position
+        distance = np.linalg.norm(relative, axis=1)
+        azimuth = np.arctan2(relative[:, 1], relative[:, 0])
+        elevation = np.arctan2(relative[:, 2], np.hypot(relative[:, 0], relative[:, 1]))
+        distance += rng.normal(0, 1, n)*np.sqrt(self.range_std**2 + (self.range_ppm*1e-6*distance)**2)
+        azimuth += rng.normal(0, self.azimuth_std, n)
+        elevation += rng.normal(0, self.elevation_std, n)
+        poses[:, 0] = self.tracker_position[0] + distance*np.cos(elevation)*np.cos(azimuth)
+        poses[:, 1] = self.tracker_position[1] + distance*np.cos(elevation)*np.sin(azimuth)
+        poses[:, 2] = self.tracker_position[2] + distance*np.sin(elevation)
+        rotate_orientations(poses, rng.normal(0, self.orientation_std, (n, 3)))
+        return angles, poses
+
+class EncoderQuantization:
+    """Recorded joint angles are rounded to the encoder resolution (rad per count, one value or one per joint),
+    the measured poses still correspond to the exact angles."""
+    def __init__(self, resolution: Union[float, list]):
+        self.resolution = np.asarray(resolution, dtype='float')
+
+    def apply(self, angles: np.ndarray, poses: np.ndarray, rng: np.random.Generator):
+        return np.round(angles/self.resolution)*self.resolution, poses
+
+class OutlierInjection:
+    """A random fraction of measurements gets a position error of given magnitude in a random direction and a rotation
+    error with components uniform in [-orientation_magnitude, orientation_magnitude]."""
+    def __init__(self, fraction: float = 0.01, magnitude: float = 0.01, orientation_magnitude: float = 0.0):
+        self.fraction = fraction
+        self.magnitude = magnitude
+        self.orientation_magnitude = orientation_magnitude
+
+    def apply(self, angles: np.ndarray, poses: np.ndarray, rng: np.random.Generator):
+        outliers = np.flatnonzero(rng.random(poses.shape[0]) < self.fraction)
+        directions = rng.normal(size=(outliers.size, 3))
+        directions /= np.linalg.norm(directions, axis=1)[:, None]
+        poses[outliers, :3] += self.magnitude*directions
+        rotations = np.zeros((poses.shape[0], 3))
+        rotations[outliers] = rng.uniform(-self.orientation_magnitude, self.orientation_magnitude, (outliers.size, 3))
+        rotate_orientations(poses, rotations)
+        return angles, poses
+
+MEASUREMENT_COMPONENTS = {"isotropic": IsotropicNoise,
+                          "tracker": TrackerNoise,
+                          "encoder_quantization": EncoderQuantization,
+                          "outliers": OutlierInjection}
+
+class MeasurementModel:
+    """Chain of measurement error components applied to whole (angles, poses) batches in config order."""
+    def __init__(self, components: list = None):
+        self.components = components or []
+
+    @classmethod
+    def from_config(cls, config: list, tracker_position: list = None):
+        # [{"type": "tracker", "range_std": 1e-5, ...}, {"type": "outliers", "fraction": 0.01}, ...]
+        components = []
+        for item in config:
+            options = {key: value for key, value in item.items() if key != "type"}
+            if item["type"] not in MEASUREMENT_COMPONENTS:
+                raise ValueError(f"Unknown measurement model component '{item['type']}', "
+                                 f"expected one of {', '.join(MEASUREMENT_COMPONENTS)}")
+            if item["type"] == "tracker":
+                options.setdefault("tracker_position", tracker_position)
+            components.append(MEASUREMENT_COMPONENTS[item["type"]](**options))
+        return cls(components)
+
+    def apply(self, angles: np.ndarray, poses: np.ndarray, rng: np.random.Generator):
+        """Returns recorded (angles, poses) for exact joint angles and exact poses, inputs are not modified"""
+        angles, poses = np.array(angles, dtype='float'), np.array(poses, dtype='float')
+        for component in self.components:
+            angles, poses = component.apply(angles, poses, rng)
+        return angles, poses
@@ -0,0 +1,121 @@
+import numpy as np
+import multiprocessing as mp
+import copy
+import time
+from identification import (PARAMS_NUMBER, LINK_PARAMS_NUMBER, BASE_OFFSET, TOOL_OFFSET, params_names, pose_residuals,
+                            transforms_to_poses)
+from identifiability import analyze_identifiability
+from sampler import WorkspaceSampler
+from dataset import measure_circles, split_circles, BASE_CIRCLE_JOINT, TOOL_CIRCLE_JOINT
+from circle_fitting import initial_guess
+from parallel_identification import run_optimization
+
+_worker_model = None
+
+def perturbation_std(model) -> np.ndarray:
+    # Std of every entry of the parameter vector for random real params around nominal
+    std = np.empty(PARAMS_NUMBER, dtype='float')
+    std[:BASE_OFFSET] = np.tile(model.study_dh_std, BASE_OFFSET//LINK_PARAMS_NUMBER)
+    for offset in (BASE_OFFSET, TOOL_OFFSET):
+        std[offset:offset + 3] = model.study_base_tool_std[0]
+        std[offset + 3:offset + 6] = model.study_base_tool_std[1]
+    return std
+
+def run_trial(model, trial: int, seed: np.random.SeedSequence) -> dict:
+    """One generate -> calibrate -> validate trial on a copy of the model, fully determined by seed."""
+    start_time = time.time()
+    rng = np.random.default_rng(seed)
+    model = copy.deepcopy(model)
+    nominal = model.get_params_vector('nominal')
+    model.set_params_vector('real', nominal + rng.normal(0, perturbation_std(model)))
+    model.set_params_vector('estimated', nominal)
+    model.identifiability_mask = np.ones(PARAMS_NUMBER, dtype='int')
+
+    sampler = WorkspaceSampler(model, model.joint_limits_general_l, model.joint_limits_general_h, 'real', rng)
+    exact_angles = sampler.sample(model.study_poses_number)
+    angles, measured_poses = model.measurement_model.apply(
+        exact_angles, transforms_to_poses(model.get_transition_matrices(exact_angles, 'real')), rng)
+
+    # Same steps as calibrate: circle initial guess, identifiability, then the configured optimization method
+    if model.study_circles_number:
+        base_circles, tool_circles = (split_circles(measure_circles(model, 0, model.study_circles_number, joint, rng))
+                                      for joint in (BASE_CIRCLE_JOINT, TOOL_CIRCLE_JOINT))
+        initial_guess(model, base_circles, tool_circles, (angles, measured_poses))
+    if model.identifiability_poses_number:
+        analyze_identifiability(model, angles[::max(1, angles.shape[0]//model.identifiability_poses_number)])
+    # Pool workers are daemonic and can not start the pool of the parallel method, in process it gives the same result
+    if model.optimization_method == "levenberg_marquardt_parallel" and mp.current_process().daemon:
+        model.optimization_method = "levenberg_marquardt"
+    report = run_optimization(model, angles, measured_poses)
+
+    # Validation against the exact real model on poses not used for calibration
+    validation_angles = sampler.sample(model.study_validation_poses_number)
+    residuals = pose_residuals(model.get_transition_matrices(validation_angles, 'estimated'),
+                               model.get_transition_matrices(validation_angles, 'real'))
+    position_errors = np.linalg.norm(residuals[:, :3], axis=1)
+    orientation_errors = np.linalg.norm(residuals[:, 3:], axis=1)
+    params_error = model.get_params_vector('estimated') - model.get_params_vector('real')
+    params_error[model.identifiability_mask == 0] = np.nan
+    return {"trial": trial,
+            "optimization_method": model.optimization_method,
+            "iterations": report["iterations"],
+            "converged": report["converged"],
+            "norm": report["norm"],
+            "identifiable_params": int(np.sum(model.identifiability_mask)),
+            "rms_position_error": float(np.sqrt(np.mean(position_errors**2))),
+            "max_position_error": float(np.max(position_errors)),
+            "rms_orientation_error": float(np.sqrt(np.mean(orientation_errors**2))),
+            "max_orientation_error": float(np.max(orientation_errors)),
+            "params_error": params_error,
+            "trial_time": time.time() - start_time}
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+def _run_trial(task) -> dict:
+    return run_trial(_worker_model, *task)
+
+def summarize(values) -> dict:
+    values = np.asarray(values, dtype='float')
+    return {"mean": float(np.mean(values)), "std": float(np.std(values)), "median": float(np.median(values)),
+            "p95": float(np.percentile(values, 95)), "max": float(np.max(values))}
+
+def aggregate_trials(model, trials: list) -> dict:
+    summary = {name: summarize([trial[name] for trial in trials])
+               for name in ("norm", "iterations", "rms_position_error", "max_position_error",
+                            "rms_orientation_error", "max_orientation_error", "trial_time")}
+    summary["converged_fraction"] = float(np.mean([trial["converged"] for trial in trials]))
+    # Non-identifiable params of a trial are excluded from the stats of that param
+    errors = np.abs(np.array([trial["params_error"] for trial in trials]))
+    identified = ~np.isnan(errors)
+    params = {}
+    for index, name in enumerate(params_names(model.nominal_dh)):
+        column = errors[identified[:, index], index]
+        params[name] = {"identified_fraction": float(np.mean(identified[:, index])),
+                        **({"mean_abs_error": float(np.mean(column)), "std_abs_error": float(np.std(column)),
+                            "max_abs_error": float(np.max(column))} if column.size else {})}
+    summary["params_error"] = params
+    return summary
+
+def run_study(model, trials: int = None, workers: int = None, seed: int = None) -> dict:
+    """Runs independent Monte Carlo calibration trials across a process pool.
+
+    Trial seeds are spawned from one SeedSequence, so results do not depend on the number of workers.
+    """
+    trials = trials or model.study_trials
+    workers = workers or model.workers
+    seed = model.study_seed if seed is None else seed
+    tasks = list(enumerate(np.random.SeedSequence(seed).spawn(trials)))
+    start_time = time.time()
+    if workers == 1:
+        results = [run_trial(model, *task) for task in tasks]
+    else:
+        with mp.Pool(workers, initializer=_init_worker, initargs=(model,)) as pool:
+            results = pool.map(_run_trial, tasks, chunksize=max(1, trials//(4*workers)))
+    study_time = time.time() - start_time
+    summary = aggregate_trials(model, results)
+    for result in results:
+        result["params_error"] = [None if np.isnan(value) else float(value) for value in result["params_error"]]
+    return {"trials_number": trials, "seed": seed, "workers": workers, "study_time": study_time,
+            "trials_per_second": trials/study_time, "summary": summary, "trials": results}
@@ -0,0 +1,131 @@
+import numpy as np
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Union
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+from dataset import is_binary_dataset, load_dataset, JOINTS_NUMBER
+
+FRAME_NAME = "frame_{:06d}.png"
+
+class OffscreenRenderer:
+    """Agg renderer of the robot arm, same look as ShowRobot but without pyplot or a display.
+
+    Axes, grid and labels are drawn once, each frame restores that background and draws only
+    the arm, the trajectory trail and the coordinates text.
+    """
+    def __init__(self, limits: list, figsize=(8, 6), dpi: int = 100):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111, projection='3d')
+        self.ax.set_xlabel('X')
+        self.ax.set_ylabel('Y')
+        self.ax.set_zlabel('Z')
+        self.ax.set_xlim(limits[0])
+        self.ax.set_ylim(limits[1])
+        self.ax.set_zlim(limits[2])
+        self.ax.grid(True, alpha=0.2)
+        self.ax.xaxis.pane.fill = False
+        self.ax.yaxis.pane.fill = False
+        self.ax.zaxis.pane.fill = False
+
+        self.trajectory_line, = self.ax.plot([], [], [], "black", alpha=0.7, linewidth=1.5, animated=True)
+        self.arm_line, = self.ax.plot([], [], [], 'blue', alpha=0.7, linewidth=2.0,
+                                      marker='o', markersize=8, markerfacecolor='blue', animated=True)
+        self.title_text = self.ax.text2D(0.5, 1.0, "", transform=self.ax.transAxes, ha='center', animated=True)
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def render(self, coords: np.ndarray, trail: np.ndarray = None) -> np.ndarray:
+        """Renders (8, 3) joint coordinates and an optional (M, 3) tool trail, returns (H, W, 4) RGBA image"""
+        self.canvas.restore_region(self.background)
+        if trail is not None and len(trail) > 1:
+            self.trajectory_line.set_data_3d(trail[:, 0], trail[:, 1], trail[:, 2])
+        else:
+            self.trajectory_line.set_data_3d([], [], [])
+        self.arm_line.set_data_3d(coords[:, 0], coords[:, 1], coords[:, 2])
+        self.title_text.set_text(f'X: {coords[-1][0]:.3f}, Y: {coords[-1][1]:.3f}, Z: {coords[-1][2]:.3f}')
+        self.ax.draw_artist(self.trajectory_line)
+        self.ax.draw_artist(self.arm_line)
+        self.ax.draw_artist(self.title_text)
+        return np.asarray(self.canvas.buffer_rgba())
+
+def load_trajectory(path: str) -> np.ndarray:
+    """Joint angles of a dataset (CSV or binary) or of a plain CSV trajectory with q1..q6 columns"""
+    if is_binary_dataset(path):
+        return np.asarray(load_dataset(path)[0])
+    with open(path, 'r') as trajectory_file:
+        header = trajectory_file.readline().strip().split(',')
+    if "q1" in header:
+        columns = [header.index(f"q{index + 1}") for index in range(JOINTS_NUMBER)]
+        return np.loadtxt(path, delimiter=',', skiprows=1, usecols=columns, ndmin=2)
+    return np.loadtxt(path, delimiter=',', usecols=range(JOINTS_NUMBER), ndmin=2)
+
+def _render_chunk(task) -> int:
+    limits, figsize, dpi, coords, first_frame, trail_length, directory = task
+    renderer = OffscreenRenderer(limits, figsize, dpi)
+    # coords start trail_length - 1 frames before first_frame so the trail is continuous across chunks
+    offset = min(first_frame, trail_length - 1)
+    for index in range(offset, coords.shape[0]):
+        trail = coords[max(0, index - trail_length + 1):index + 1, -1]
+        image = renderer.render(coords[index], trail)
+        Image.fromarray(image).convert("RGB").save(os.path.join(directory, FRAME_NAME.format(first_frame + index - offset)),
+                                                   compress_level=1)
+    return coords.shape[0] - offset
+
+def render_frames(coords: np.ndarray, limits: list, directory: str, workers: int = None, figsize=(8, 6), dpi: int = 100,
+                  trail_length: int = 50, chunk_size: int = 100) -> int:
+    """Renders (N, 8, 3) joint coordinates to a PNG sequence in directory using a pool of Agg renderers"""
+    os.makedirs(directory, exist_ok=True)
+    workers = workers or mp.cpu_count()
+    tasks = []
+    for start in range(0, coords.shape[0], chunk_size):
+        trail_start = max(0, start - trail_length + 1)
+        tasks.append((limits, figsize, dpi, coords[trail_start:start + chunk_size], start, trail_length, directory))
+    if workers == 1:
+        return sum(map(_render_chunk, tasks))
+    with mp.Pool(workers) as pool:
+        return sum(pool.imap_unordered(_render_chunk, tasks))
+
+def _load_frames(directory: str, first: int, last: int):
+    # Frames are read one at a time and their files closed right away, long sequences would exhaust file descriptors
+    for index in range(first, last):
+        with Image.open(os.path.join(directory, FRAME_NAME.format(index))) as image:
+            yield image.copy()
+
+def encode_video(directory: str, output: str, frames: int, fps: int = 30):
+    """Joins a PNG sequence into a GIF with Pillow or into any other video format with ffmpeg"""
+    if output.lower().endswith(".gif"):
+        first = next(_load_frames(directory, 0, 1))
+        first.save(output, save_all=True, append_images=_load_frames(directory, 1, frames), duration=1000/fps, loop=0)
+        return
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"ffmpeg is required to write {output}, use a .gif file or a directory for PNG frames")
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), "-i", os.path.join(directory, "frame_%06d.png"),
+                    "-pix_fmt", "yuv420p", output], check=True)
+
+def render_trajectory(model, angles: Union[np.ndarray, list], output: str, type: str = "nominal", workers: int = None,
+                      fps: int = 30, **render_options) -> dict:
+    """Renders a joint trajectory without a display.
+
+    Joint coordinates of all frames are computed in one batched pass. output is either a directory for a PNG
+    sequence or a video file name (.gif, or any format ffmpeg can write).
+    """
+    start_time = time.time()
+    coords = model.get_joint_coordinates(np.asarray(angles, dtype='float'), type)
+    fk_time = time.time() - start_time
+    workers = workers or model.workers
+    if os.path.splitext(output)[1]:
+        with tempfile.TemporaryDirectory() as directory:
+            frames = render_frames(coords, model.cartesian_limits, directory, workers, **render_options)
+            encode_video(directory, output, frames, fps)
+    else:
+        frames = render_frames(coords, model.cartesian_limits, output, workers, **render_options)
+    render_time = time.time() - start_time
+    return {"frames": frames, "fk_time": fk_time, "render_time": render_time, "fps": frames/render_time}
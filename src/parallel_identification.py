@@ -0,0 +1,104 @@
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from identification import accumulate_normal_equations, damped_least_squares, levenberg_marquardt, levenberg_marquardt_streaming
+from dataset import BinaryDataset
+
+# Tasks per worker, more tasks than workers evens out the load of slower cores
+TASKS_PER_WORKER = 4
+
+_worker_state = {}
+
+def _init_worker(dataset_path, shm_name, shape, dh_template, rows, columns, chunk_size):
+    if dataset_path is not None:
+        dataset = BinaryDataset(dataset_path)
+        angles, measured_poses = dataset.angles, dataset.poses
+    else:
+        # Keep the shared memory handle alive as long as the views are used
+        _worker_state["shm"] = shm = shared_memory.SharedMemory(name=shm_name)
+        data = np.ndarray(shape, dtype='float', buffer=shm.buf)
+        angles, measured_poses = data[:, :6], data[:, 6:]
+    _worker_state.update(angles=angles, measured_poses=measured_poses, dh_template=dh_template, rows=rows,
+                         columns=columns, chunk_size=chunk_size)
+
+def _evaluate_slice(task):
+    vector, start, stop = task
+    state = _worker_state
+    return accumulate_normal_equations(vector, state["dh_template"], state["angles"][start:stop],
+                                       state["measured_poses"][start:stop], state["rows"], state["columns"],
+                                       state["chunk_size"])
+
+class ParallelNormalEquations:
+    """Process pool which evaluates J^T J, J^T r and the residual sum of squares over slices of a dataset.
+
+    In-memory datasets are copied once to shared memory, binary datasets are mapped by every worker from
+    dataset_path. Partial sums are reduced in a fixed order, so results do not depend on scheduling.
+    """
+    def __init__(self, model, angles: np.ndarray, measured_poses: np.ndarray, workers: int = None, chunk_size: int = None,
+                 dataset_path: str = None):
+        self.workers = workers or model.workers
+        self.shm = None
+        self.pool = None
+        rows_number = angles.shape[0]
+        if rows_number == 0:
+            raise ValueError("dataset has no rows")
+        if dataset_path is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=rows_number*12*8)
+            data = np.ndarray((rows_number, 12), dtype='float', buffer=self.shm.buf)
+            data[:, :6] = angles
+            data[:, 6:] = measured_poses
+        bounds = np.linspace(0, rows_number, min(rows_number, self.workers*TASKS_PER_WORKER) + 1).astype('int')
+        self.slices = list(zip(bounds[:-1], bounds[1:]))
+        try:
+            self.pool = mp.Pool(self.workers, initializer=_init_worker,
+                                initargs=(dataset_path, self.shm and self.shm.name, (rows_number, 12), model.nominal_dh,
+                                          model.measurable_params_mask, model.identifiability_mask == 1,
+                                          chunk_size or model.chunk_size))
+        except BaseException:
+            # The shared memory block would outlive the process otherwise
+            self.close()
+            raise
+
+    def __call__(self, vector: np.ndarray):
+        results = self.pool.map(_evaluate_slice, [(vector, start, stop) for start, stop in self.slices])
+        jtj, jtr, sse = results[0]
+        for chunk_jtj, chunk_jtr, chunk_sse in results[1:]:
+            jtj = jtj + chunk_jtj
+            jtr = jtr + chunk_jtr
+            sse += chunk_sse
+        return jtj, jtr, sse
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def levenberg_marquardt_parallel(model, angles: np.ndarray, measured_poses: np.ndarray, max_iterations: int = 100,
+                                 workers: int = None, dataset_path: str = None) -> dict:
+    """Same as levenberg_marquardt, residuals and Jacobians are evaluated by a pool of model.workers processes."""
+    with ParallelNormalEquations(model, angles, measured_poses, workers, dataset_path=dataset_path) as evaluate:
+        report = damped_least_squares(model, evaluate, angles.shape[0]*len(model.measurable_params_mask), max_iterations)
+        report["workers"] = evaluate.workers
+    return report
+
+def run_optimization(model, angles: np.ndarray, measured_poses: np.ndarray, dataset_path: str = None) -> dict:
+    """Identifies the estimated params with model.optimization_method, dataset_path is the binary file of the
+    dataset if there is one, the parallel workers map it instead of copying the dataset to shared memory."""
+    if model.optimization_method == "levenberg_marquardt":
+        return levenberg_marquardt(model, angles, measured_poses)
+    if model.optimization_method == "levenberg_marquardt_streaming":
+        return levenberg_marquardt_streaming(model, angles, measured_poses)
+    if model.optimization_method == "levenberg_marquardt_parallel":
+        return levenberg_marquardt_parallel(model, angles, measured_poses, dataset_path=dataset_path)
+    raise ValueError(f"Unknown optimization method: {model.optimization_method}")
@@ -0,0 +1,81 @@
+import numpy as np
+from math_routines import pose_tf
+from robotic_transformations import KinematicChain
+from identification import params_to_vector, vector_to_params
+
+def freeze(values) -> tuple:
+    # Nested lists or arrays -> nested tuples
+    return tuple(freeze(value) if isinstance(value, (list, tuple, np.ndarray)) else value for value in values)
+
+class ParameterSet:
+    """DH, base and tool params of one model type with derived data cached per version.
+
+    Every write bumps version, the parameter vector, base/tool transforms and the kinematic chain are rebuilt
+    lazily on the first access after it. Params are stored as tuples, so they can only change through set and
+    an in-place edit can not leave stale cached data.
+    """
+    def __init__(self, name: str, dh: list, base_params: list, tool_params: list):
+        self.name = name
+        self.version = 0
+        self._cache_version = -1
+        self.set(dh, base_params, tool_params)
+
+    def set(self, dh: list = None, base_params: list = None, tool_params: list = None):
+        # Omitted parts keep their current values
+        if dh is not None:
+            self.dh = freeze(dh)
+        if base_params is not None:
+            self.base_params = freeze(base_params)
+        if tool_params is not None:
+            self.tool_params = freeze(tool_params)
+        self.version += 1
+
+    def set_vector(self, vector: np.ndarray, dh_template: list):
+        self.set(*vector_to_params(vector, dh_template))
+
+    @property
+    def params(self):
+        return self.dh, self.base_params, self.tool_params
+
+    def _update(self):
+        if self._cache_version != self.version:
+            self._vector = params_to_vector(*self.params)
+            self._chain = KinematicChain(self.dh, pose_tf(self.base_params), pose_tf(self.tool_params))
+            self._cache_version = self.version
+
+    @property
+    def vector(self) -> np.ndarray:
+        self._update()
+        return self._vector
+
+    @property
+    def chain(self) -> KinematicChain:
+        self._update()
+        return self._chain
+
+    @property
+    def base_tf(self) -> np.ndarray:
+        return self.chain.base_tf
+
+    @property
+    def tool_tf(self) -> np.ndarray:
+        return self.chain.tool_tf
+
+class ParameterRegistry:
+    def __init__(self):
+        self.sets = {}
+
+    def add(self, name: str, dh: list, base_params: list, tool_params: list) -> ParameterSet:
+        self.sets[name] = ParameterSet(name, dh, base_params, tool_params)
+        return self.sets[name]
+
+    def __getitem__(self, name: str) -> ParameterSet:
+        if name not in self.sets:
+            raise ValueError(f"type must be one of {', '.join(repr(key) for key in self.sets)}")
+        return self.sets[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sets
+
+    def versions(self) -> dict:
+        return {name: parameter_set.version for name, parameter_set in self.sets.items()}
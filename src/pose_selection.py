@@ -0,0 +1,76 @@
+import numpy as np
+
+def observability_indices(jac: np.ndarray) -> dict:
+    """Observability indices of a stacked identification Jacobian (N, m, k) or (M, k).
+
+    O1 is the geometric mean of singular values over sqrt(M), O3 the inverse condition number,
+    D the log determinant of the information matrix J^T J.
+    """
+    jac = jac.reshape(-1, jac.shape[-1])
+    singular_values = np.linalg.svd(jac, compute_uv=False)
+    if singular_values[-1] <= 0:
+        return {"O1": 0.0, "O3": 0.0, "D": float('-inf')}
+    return {"O1": float(np.exp(np.mean(np.log(singular_values)))/np.sqrt(jac.shape[0])),
+            "O3": float(singular_values[-1]/singular_values[0]),
+            "D": float(2*np.sum(np.log(singular_values)))}
+
+def _gains(gram: np.ndarray) -> np.ndarray:
+    # log det(I + J_c M^-1 J_c^T) for every candidate, i.e. log det increase of the information matrix
+    return np.linalg.slogdet(gram + np.eye(gram.shape[-1]))[1]
+
+def _update(jac: np.ndarray, m_inv: np.ndarray, gram: np.ndarray, pose: int, sign: int):
+    """Adds (sign=1) or removes (sign=-1) the rows of one pose, M^-1 and all candidate grams are updated in place.
+
+    Woodbury identity: the update of M^-1 and of every J_c M^-1 J_c^T is a rank m correction, so the cost per step is
+    O(N*m*m*k) instead of refactorizing the information matrix for every candidate.
+    """
+    a = jac[pose] @ m_inv
+    s = np.eye(jac.shape[1]) + sign*(a @ jac[pose].T)
+    s_inv = np.linalg.inv(s)
+    m_inv -= sign*(a.T @ s_inv @ a)
+    cross = np.einsum('nik,jk->nij', jac, a)
+    gram -= sign*(cross @ s_inv @ cross.transpose(0, 2, 1))
+
+def select_poses(model, candidate_angles: np.ndarray, poses_number: int, type: str = 'nominal',
+                 exchange_passes: int = 1, regularization: float = 1e-6, identifiability_mask: np.ndarray = None) -> dict:
+    """D-optimal subset of candidate poses for identification of the identifiable params of the model.
+
+    Greedy forward selection followed by Fedorov exchange passes, every selected pose is swapped for the best
+    candidate whenever that increases det(J^T J). Jacobian columns are normalized over the candidate pool.
+    """
+    jac = model.get_identification_jacobian(candidate_angles, type, identifiability_mask)
+    norms = np.sqrt(np.mean(np.sum(jac**2, axis=1), axis=0))
+    jac = jac/np.where(norms > 0, norms, 1)
+    candidates_number, _, params_number = jac.shape
+
+    m_inv = np.eye(params_number)/regularization
+    gram = np.einsum('nik,njk->nij', jac, jac)/regularization
+    selected = np.zeros(candidates_number, dtype='bool')
+    for _ in range(min(poses_number, candidates_number)):
+        gains = np.where(selected, -np.inf, _gains(gram))
+        best = int(np.argmax(gains))
+        _update(jac, m_inv, gram, best, 1)
+        selected[best] = True
+
+    exchanges = 0
+    for _ in range(exchange_passes):
+        swapped = False
+        for pose in np.flatnonzero(selected):
+            _update(jac, m_inv, gram, pose, -1)
+            selected[pose] = False
+            gains = np.where(selected, -np.inf, _gains(gram))
+            best = int(np.argmax(gains))
+            # Keep the old pose unless the new one is strictly better
+            if gains[best] <= gains[pose]*(1 + 1e-12):
+                best = pose
+            _update(jac, m_inv, gram, best, 1)
+            selected[best] = True
+            if best != pose:
+                exchanges += 1
+                swapped = True
+        if not swapped:
+            break
+
+    indices = np.flatnonzero(selected)
+    return {"indices": indices, "exchanges": exchanges, "indices_selected": observability_indices(jac[indices]),
+            "indices_all": observability_indices(jac)}
@@ -19,6 +19,7 @@ class ShowRobot:
         self.trajectory = deque(maxlen=self.trajectory_max_points)
 
         self.limits = limits 
+        self.last_title_update = 0
         self.setup()
         
     def setup(self):
@@ -39,87 +40,59 @@ class ShowRobot:
         self.ax.yaxis.pane.fill = False
         self.ax.zaxis.pane.fill = False
 
-        # Initialize plots for all points
-        self.current_points = []
-        self.connection_lines = []
+        # Animated artists are skipped by the full redraw and drawn over the cached background
+        self.trajectory_line, = self.ax.plot([], [], [], "black", alpha=0.7, linewidth=1.5, animated=True)
+        # Whole arm as one polyline, joints as markers
+        self.arm_line, = self.ax.plot([], [], [], 'blue', alpha=0.7, linewidth=2.0,
+                                      marker='o', markersize=8, markerfacecolor='blue', animated=True)
+        self.title_text = self.ax.text2D(0.5, 1.0, "", transform=self.ax.transAxes, ha='center', animated=True)
+        self.animated_artists = [self.trajectory_line, self.arm_line, self.title_text]
 
-        # Trajectory line
-        self.trajectory_line, = self.ax.plot([], [], [], "black", alpha=0.7, linewidth=1.5)
-
-        for i in range(8):
-            # Current points
-            point = self.ax.scatter([0], [0], [0], c='blue', 
-                                  s=80, marker='o', 
-                                  label=f'Point {i+1}')
-            self.current_points.append(point)
-        
-        # Connection lines between consecutive points
-        for i in range(7):  # 7 connections for 8 points
-            conn_line, = self.ax.plot([], [], [], 'blue', alpha=0.7, 
-                                    linewidth=2.0,
-                                    label=f'P{i+1}-P{i+2}' if i == 0 else "")
-            self.connection_lines.append(conn_line)
-        
-        # Add legend
-        #self.ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        
-        # Initial draw
+        self.background = None
+        self.draw_event_id = self.fig.canvas.mpl_connect('draw_event', self.on_draw)
         self.fig.canvas.draw()
-        
+
+    def on_draw(self, event):
+        # Full redraws (resize, view rotation) invalidate the cached background
+        if event is not None and event.canvas != self.fig.canvas:
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for artist in self.animated_artists:
+            self.ax.draw_artist(artist)
+
     def update_robot(self, points_coords):
-        
-        # Update trajectory lines
-        self.trajectory.append(points_coords[-1])
+        points_coords = np.asarray(points_coords)
 
-        # Convert trajectory to numpy array for plotting
+        self.trajectory.append(points_coords[-1])
         if len(self.trajectory) > 1:
             traj_array = np.array(self.trajectory)
-            self.trajectory_line.set_data(traj_array[:, 0], traj_array[:, 1])
-            self.trajectory_line.set_3d_properties(traj_array[:, 2])
+            self.trajectory_line.set_data_3d(traj_array[:, 0], traj_array[:, 1], traj_array[:, 2])
         else:
-            # Clear the line if we don't have enough points
-            self.trajectory_line.set_data([], [])
-            self.trajectory_line.set_3d_properties([])
-        
-        # Update current points
-        for i in range(8):
-            x, y, z = points_coords[i]
-            self.current_points[i]._offsets3d = ([x], [y], [z])
-        
-        # Update connection lines between consecutive points
-        total_length = 0
-        for i in range(7):
-            x1, y1, z1 = points_coords[i]
-            x2, y2, z2 = points_coords[i + 1]
-            
-            self.connection_lines[i].set_data([x1, x2], [y1, y2])
-            self.connection_lines[i].set_3d_properties([z1, z2])
-            
-            # Calculate segment length
-            segment_length = np.sqrt((x2 - x1)**2 + (y2 - y1)**2 + (z2 - z1)**2)
-            total_length += segment_length
-        
-        if hasattr(self, 'last_title_update'):
-            if time.time() - self.last_title_update > 0.2:  # Update title every 200ms
-                self.ax.set_title(f'X: {points_coords[-1][0]:.3f}, Y: {points_coords[-1][1]:.3f}, Z: {points_coords[-1][2]:.3f}')
-                self.last_title_update = time.time()
-        else:
-            self.ax.set_title(f'X: {points_coords[-1][0]:.3f}, Y: {points_coords[-1][1]:.3f}, Z: {points_coords[-1][2]:.3f}')
+            self.trajectory_line.set_data_3d([], [], [])
+
+        self.arm_line.set_data_3d(points_coords[:, 0], points_coords[:, 1], points_coords[:, 2])
+
+        if time.time() - self.last_title_update > 0.2:  # Update title every 200ms
+            self.title_text.set_text(f'X: {points_coords[-1][0]:.3f}, Y: {points_coords[-1][1]:.3f}, Z: {points_coords[-1][2]:.3f}')
             self.last_title_update = time.time()
-        
-        # Use blitting for faster updates
-        try:
-            self.fig.canvas.draw_idle()
-        except:
-            self.fig.canvas.draw()
-        
-        self.fig.canvas.flush_events()
+
+        canvas = self.fig.canvas
+        if self.background is None or not canvas.supports_blit:
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self.background)
+            self.draw_animated()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
     
     def clear_trajectory(self):
         self.trajectory.clear()
-        self.trajectory_line.set_data([], [])
-        self.trajectory_line.set_3d_properties([])
+        self.trajectory_line.set_data_3d([], [], [])
         self.fig.canvas.draw()
     
     def close(self):
+        self.fig.canvas.mpl_disconnect(self.draw_event_id)
         plt.close(self.fig)
\ No newline at end of file
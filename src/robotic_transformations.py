@@ -26,4 +26,67 @@ def hayati_trans(params: Union[np.ndarray, list], angle: Union[int, float]) -> n
                     [ sa*sb*cq+cb*sq,  ca*cq, -sa*cb*cq+sb*sq, a*sq],
                     [         -ca*sb,     sa,           ca*cb,    0],
                     [              0,      0,               0,    1]], dtype='float')
-    return mat
\ No newline at end of file
+    return mat
+
+class KinematicChain:
+    """Serial chain with precomputed constant link factors.
+
+    Both link types are Rz(theta_offset + angle) @ S, where S is Tz(d) @ Tx(a) @ Rx(alpha) for DH links and
+    Tx(a) @ Rx(alpha) @ Ry(beta) for Hayati links. S is computed once, so a link evaluation only needs
+    sin/cos of the joint angle and a rotation of the first two rows of S.
+    """
+    def __init__(self, params: list, base_tf: np.ndarray, tool_tf: np.ndarray):
+        self.base_tf = np.array(base_tf, dtype='float')
+        self.tool_tf = np.array(tool_tf, dtype='float')
+        self.theta_offsets = np.array([unit[3] for unit in params], dtype='float')
+        self.static = np.empty((len(params), 4, 4), dtype='float')
+        for index, unit in enumerate(params):
+            if unit[-1] == 0:
+                self.static[index] = dh_trans(unit, -unit[3])
+            else:
+                self.static[index] = hayati_trans(unit, -unit[3])
+        self._links = np.empty((len(params), 4, 4), dtype='float')
+        self._links[:, 2:] = self.static[:, 2:]
+
+    def link_transforms(self, angles: Union[np.ndarray, list]) -> np.ndarray:
+        # (6,) angles -> (6, 4, 4) or (N, 6) angles -> (N, 6, 4, 4)
+        q = self.theta_offsets + np.asarray(angles, dtype='float')
+        sq = np.sin(q)[..., None]
+        cq = np.cos(q)[..., None]
+        if q.ndim == 1:
+            links = self._links.copy()
+        else:
+            links = np.empty(q.shape + (4, 4), dtype='float')
+            links[..., 2:, :] = self.static[:, 2:]
+        links[..., 0, :] = cq*self.static[:, 0] - sq*self.static[:, 1]
+        links[..., 1, :] = sq*self.static[:, 0] + cq*self.static[:, 1]
+        return links
+
+    def frames(self, angles: Union[np.ndarray, list]) -> np.ndarray:
+        """All chain frames in one pass: (6,) angles -> (8, 4, 4), (N, 6) angles -> (N, 8, 4, 4).
+
+        Frames are the base, the six link frames (the 7th is the flange) and the tool.
+        """
+        links = self.link_transforms(angles)
+        joints_number = links.shape[-3]
+        frames = np.empty(links.shape[:-3] + (joints_number + 2, 4, 4), dtype='float')
+        frames[..., 0, :, :] = self.base_tf
+        for index in range(joints_number):
+            np.matmul(frames[..., index, :, :], links[..., index, :, :], out=frames[..., index + 1, :, :])
+        np.matmul(frames[..., joints_number, :, :], self.tool_tf, out=frames[..., -1, :, :])
+        return frames
+
+    def transition_matrix(self, angles: Union[np.ndarray, list], with_tool: bool = True) -> np.ndarray:
+        return self.frames(angles)[-1 if with_tool else -2]
+
+    def transition_matrices(self, angles: np.ndarray, with_tool: bool = True) -> np.ndarray:
+        # Only the end transforms are kept, large batches don't allocate the intermediate frames
+        links = self.link_transforms(np.atleast_2d(angles))
+        main_tf = self.base_tf @ links[:, 0]
+        for index in range(1, links.shape[1]):
+            main_tf = np.matmul(main_tf, links[:, index])
+        return main_tf @ self.tool_tf if with_tool else main_tf
+
+    def joint_coordinates(self, angles: np.ndarray) -> np.ndarray:
+        # (N, 6) angles -> (N, 8, 3) origins of the base, link and tool frames, a view of frames()
+        return self.frames(np.atleast_2d(angles))[..., :3, 3]
@@ -0,0 +1,88 @@
+import numpy as np
+import time
+from typing import Union
+
+class WorkspaceSampler:
+    """Draws joint configurations whose tool pose lies inside cartesian_limits and max_z_angle.
+
+    Candidates are drawn in vectorized batches and filtered with batched FK. The proposal box is narrowed
+    to the joint ranges of accepted samples (plus a margin) while the acceptance rate stays low, and the batch
+    size follows the observed acceptance rate so that one or two batches are usually enough. ValueError is raised
+    if nothing is accepted within max_batch_size proposals.
+    """
+    def __init__(self, model, joint_limits_l: list, joint_limits_h: list, type: str = 'nominal',
+                 rng: Union[np.random.Generator, int, None] = None, batch_size: int = 4096, max_batch_size: int = 1000000,
+                 target_acceptance: float = 0.5, margin: float = 0.05):
+        self.model = model
+        self.type = type
+        self.rng = np.random.default_rng(rng)
+        self.joint_limits_l = np.asarray(joint_limits_l, dtype='float')
+        self.joint_limits_h = np.asarray(joint_limits_h, dtype='float')
+        self.cartesian_limits = np.asarray(model.cartesian_limits, dtype='float')
+        self.max_z_angle = model.max_z_angle
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.target_acceptance = target_acceptance
+        self.margin = margin
+
+        self.proposal_l = self.joint_limits_l.copy()
+        self.proposal_h = self.joint_limits_h.copy()
+        self.accepted_l = np.full_like(self.joint_limits_l, np.inf)
+        self.accepted_h = np.full_like(self.joint_limits_h, -np.inf)
+        self.proposed_number = 0
+        self.accepted_number = 0
+        self.sampling_time = 0.0
+
+    def in_workspace(self, tfs: np.ndarray) -> np.ndarray:
+        position = tfs[:, :3, 3]
+        inside = np.all((position >= self.cartesian_limits[:, 0]) & (position <= self.cartesian_limits[:, 1]), axis=1)
+        # Angle between the tool z axis and the base z axis
+        z_angle = np.arccos(np.clip(tfs[:, 2, 2], -1.0, 1.0))
+        return inside & (z_angle <= self.max_z_angle)
+
+    def adapt_proposal(self):
+        if self.acceptance_rate >= self.target_acceptance or self.accepted_number == 0:
+            return
+        span = self.margin*(self.joint_limits_h - self.joint_limits_l)
+        self.proposal_l = np.maximum(self.joint_limits_l, self.accepted_l - span)
+        self.proposal_h = np.minimum(self.joint_limits_h, self.accepted_h + span)
+
+    def sample(self, samples_number: int) -> np.ndarray:
+        start_time = time.perf_counter()
+        result = np.empty((samples_number, len(self.joint_limits_l)), dtype='float')
+        filled = 0
+        while filled < samples_number:
+            missing = samples_number - filled
+            rate = self.acceptance_rate if self.proposed_number else 1.0
+            batch = int(min(self.max_batch_size, max(self.batch_size, 1.2*missing/max(rate, 1e-3))))
+            angles = self.rng.uniform(self.proposal_l, self.proposal_h, (batch, len(self.proposal_l)))
+            accepted = angles[self.in_workspace(self.model.get_transition_matrices(angles, self.type))]
+
+            self.proposed_number += batch
+            self.accepted_number += accepted.shape[0]
+            if accepted.shape[0]:
+                self.accepted_l = np.minimum(self.accepted_l, accepted.min(axis=0))
+                self.accepted_h = np.maximum(self.accepted_h, accepted.max(axis=0))
+            self.adapt_proposal()
+            # The proposal is the full joint range until the first acceptance, max_batch_size misses mean an empty workspace
+            if self.accepted_number == 0 and self.proposed_number >= self.max_batch_size:
+                raise ValueError(f"None of {self.proposed_number} joint configurations reaches cartesian_limits "
+                                 f"{self.cartesian_limits.tolist()} with max_z_angle {self.max_z_angle}")
+
+            accepted = accepted[:missing]
+            result[filled:filled + accepted.shape[0]] = accepted
+            filled += accepted.shape[0]
+        self.sampling_time += time.perf_counter() - start_time
+        return result
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted_number/self.proposed_number if self.proposed_number else 0.0
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.accepted_number/self.sampling_time if self.sampling_time else 0.0
+
+    def get_stats(self) -> dict:
+        return {"proposed": self.proposed_number, "accepted": self.accepted_number, "acceptance_rate": self.acceptance_rate,
+                "samples_per_second": self.samples_per_second, "sampling_time": self.sampling_time}
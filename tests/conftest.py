@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Windows and figures of the interactive tools are created without a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("MPLBACKEND", "Agg")
+# Modules of src import each other by name, the same way calibration_sim.py is run from src
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+@pytest.fixture
+def config(tmp_path) -> dict:
+    """ARM95 config with real params a few mm/mrad off nominal and all output files in tmp_path"""
+    with open(os.path.join(ROOT, "ARM95.json"), 'r') as config_file:
+        config = json.load(config_file)
+    rng = np.random.default_rng(0)
+    config["real_dh"] = [[value + rng.normal(0, 1e-3) for value in unit[:-1]] + [unit[-1]] for unit in config["nominal_dh"]]
+    config["real_base_params"] = [value + rng.normal(0, 1e-3) for value in config["nominal_base_params"]]
+    config["real_tool_params"] = [value + rng.normal(0, 1e-3) for value in config["nominal_tool_params"]]
+    for key in ("dataset_file", "base_circles_dataset_file", "tool_circles_dataset_file", "results_file"):
+        config[key] = str(tmp_path/os.path.basename(config[key]))
+    config["workers"] = 2
+    return config
+
+@pytest.fixture
+def model(config):
+    from calibration_sim import HayatiModel
+    return HayatiModel(config)
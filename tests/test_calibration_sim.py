@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from calibration_sim import calibrate, load_results
+from dataset import generate_datasets
+
+@pytest.mark.parametrize("method", ["levenberg_marquardt", "levenberg_marquardt_streaming"])
+def test_generate_and_calibrate(model, method):
+    model.optimization_method = method
+    model.general_samples_number, model.circle_samples_number = 300, 4
+    generate_datasets(model, workers=1, seed=0)
+    report = calibrate(model)
+    assert report["converged"] and report["samples_number"] == 300
+    # Noise-free measurements: the estimated model reproduces the real one on new poses
+    assert report["norm"] < 1e-9
+    angles = np.random.default_rng(1).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (100, 6))
+    assert np.allclose(model.get_transition_matrices(angles, 'estimated'), model.get_transition_matrices(angles, 'real'),
+                       atol=1e-8)
+    estimated = model.get_params_vector('estimated')
+    model.set_params_vector('estimated', model.get_params_vector('nominal'))
+    load_results(model)
+    assert np.allclose(model.get_params_vector('estimated'), estimated)
+
+def test_calibrate_rejects_an_empty_dataset(model):
+    model.general_samples_number, model.circle_samples_number = 0, 0
+    generate_datasets(model, workers=1, seed=0)
+    with pytest.raises(ValueError, match="has no rows"):
+        calibrate(model)
+
+def test_calibrate_rejects_an_unknown_method(model):
+    model.optimization_method = "gauss_newton"
+    model.general_samples_number, model.circle_samples_number = 20, 0
+    generate_datasets(model, workers=1, seed=0)
+    with pytest.raises(ValueError, match="gauss_newton"):
+        calibrate(model)
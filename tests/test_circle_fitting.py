@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from circle_fitting import group_circles, fit_circles, estimate_base_params, estimate_tool_params, initial_guess
+from identification import transforms_to_poses
+from dataset import measure_circles, split_circles, generate_datasets, BASE_CIRCLE_JOINT, TOOL_CIRCLE_JOINT
+
+BASE_PARAMS = [0.01, -0.02, 0.005, 0.0, 0.01, -0.02]
+TOOL_PARAMS = [0.01, 0.02, 0.05, 0.0, 0.0, 1.5708]
+
+@pytest.fixture
+def model(config):
+    # Exact link params, so the circles only carry the base and tool errors
+    from calibration_sim import HayatiModel
+    config.update(real_dh=config["nominal_dh"], real_base_params=BASE_PARAMS, real_tool_params=TOOL_PARAMS)
+    return HayatiModel(config)
+
+def circles(model, joint: int, seed: int = 0) -> tuple:
+    return split_circles(measure_circles(model, 0, 10, joint, np.random.default_rng(seed)))
+
+def test_fit_circles_recovers_center_radius_and_normal():
+    angles = np.linspace(0, 1.5, 12)
+    center, radius = np.array([0.3, -0.2, 0.5]), 0.07
+    points = center + radius*np.column_stack([np.cos(angles), np.zeros_like(angles), np.sin(angles)])
+    fit = fit_circles(group_circles(np.zeros(len(angles), dtype='int'), points))
+    assert np.allclose(fit["centers"][0], center) and np.isclose(fit["radii"][0], radius)
+    # x -> z rotation is about -y
+    assert np.allclose(fit["normals"][0], [0, -1, 0])
+    assert fit["rms"][0] < 1e-12
+
+def test_base_axis_is_recovered(model):
+    params, report = estimate_base_params(model, *circles(model, BASE_CIRCLE_JOINT)[::2])
+    assert np.allclose(params[3:], BASE_PARAMS[3:], atol=1e-9)
+    # The origin is known up to a shift along the joint 1 axis
+    shift = np.array(params[:3]) - BASE_PARAMS[:3]
+    assert np.allclose(shift - (shift @ report["axis_direction"])*np.array(report["axis_direction"]), 0, atol=1e-9)
+
+def test_tool_point_is_recovered_with_a_perturbed_base(model):
+    model.real_base_params = [0.01, -0.02, 0.005, 0.01, 0.01, -0.02]
+    params, report = estimate_tool_params(model, *circles(model, TOOL_CIRCLE_JOINT))
+    assert np.allclose(params[:3], TOOL_PARAMS[:3], atol=1e-9)
+    assert abs(report["radius_error"]) < 1e-6
+
+def test_initial_guess_sets_estimated_base_and_tool(model):
+    angles = np.random.default_rng(1).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (50, 6))
+    dataset = (angles, transforms_to_poses(model.get_transition_matrices(angles, 'real')))
+    report = initial_guess(model, circles(model, BASE_CIRCLE_JOINT), circles(model, TOOL_CIRCLE_JOINT, 1), dataset)
+    assert report["base"]["accepted"] and report["tool"]["accepted"]
+    assert np.allclose(model.estimated_tool_params[:3], TOOL_PARAMS[:3], atol=1e-9)
+
+def test_empty_circle_datasets(model):
+    with pytest.raises(ValueError):
+        group_circles(np.empty(0, dtype='int'), np.empty((0, 3)))
+    from calibration_sim import calibrate
+    model.general_samples_number, model.circle_samples_number = 100, 0
+    generate_datasets(model, workers=1, seed=0)
+    report = calibrate(model)
+    assert report["initial_guess"] is None and report["samples_number"] == 100
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from compensation import CompensationTable
+
+@pytest.fixture
+def table(model):
+    model.set_params_vector('estimated', model.get_params_vector('real'))
+    return CompensationTable.build(model, [3]*6)
+
+def test_nodes_avoid_the_wrist_singularity(model, table):
+    # Symmetric q5 limits put the middle node of an odd grid on q5 = 0
+    assert np.isclose(model.joint_limits_general_l[4] + model.joint_limits_general_h[4], 0)
+    nodes = CompensationTable.grid_nodes(table.lower, table.upper, table.shape)
+    assert np.min(np.abs(nodes[:, 4])) > 0.1
+    # and every node is reachable
+    assert np.all(nodes >= model.joint_limits_general_l) and np.all(nodes <= model.joint_limits_general_h)
+
+def test_corrections_reduce_node_errors(model, table):
+    report = table.error_bounds(model, 2000, seed=0)
+    assert report["valid_nodes"] + report["invalid_nodes"] == table.valid.size
+    assert np.all(table.corrections[~table.valid] == 0)
+    assert report["compensated"]["rms_position_error"] < report["uncompensated"]["rms_position_error"]
+
+def test_save_and_load_keep_the_valid_mask(table, tmp_path):
+    table.valid.flat[0] = False
+    table.save(str(tmp_path/"table.npz"))
+    loaded = CompensationTable.load(str(tmp_path/"table.npz"))
+    assert np.array_equal(loaded.valid, table.valid)
+    assert np.array_equal(loaded.corrections, table.corrections)
+
+def test_grid_needs_two_nodes_per_joint(model):
+    with pytest.raises(ValueError):
+        CompensationTable.build(model, [3, 3, 3, 3, 1, 3])
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from dataset import (DATASET_HEADER, CIRCLES_DATASET_HEADER, open_dataset_writer, load_dataset, load_circles_dataset,
+                     csv_to_binary, read_binary_header, is_binary_dataset, generate_datasets)
+
+def write(path, header: str, chunks: list):
+    with open_dataset_writer(str(path), header, {"robot": "test"}) as writer:
+        for chunk in chunks:
+            writer.append(chunk)
+    return writer.rows
+
+def measurements(rows: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(rows, 12))
+
+@pytest.mark.parametrize("rows", [0, 1, 25])
+def test_csv_to_binary_round_trip(tmp_path, rows):
+    data = measurements(rows)
+    csv_path, binary_path = tmp_path/"data.csv", tmp_path/"data.bin"
+    assert write(csv_path, DATASET_HEADER, [data[:10], data[10:]]) == rows
+    assert csv_to_binary(str(csv_path), str(binary_path), {"robot": "test"}, chunk_rows=7) == rows
+
+    assert is_binary_dataset(str(binary_path)) and not is_binary_dataset(str(csv_path))
+    header, _ = read_binary_header(str(binary_path))
+    assert header["rows"] == rows and header["robot"] == "test"
+    for path in (csv_path, binary_path):
+        angles, poses = load_dataset(str(path))
+        assert angles.shape == (rows, 6) and poses.shape == (rows, 6)
+        assert np.allclose(angles, data[:, :6], rtol=1e-11, atol=0)
+        assert np.allclose(poses, data[:, 6:], rtol=1e-11, atol=0)
+
+def test_binary_writer_keeps_full_precision(tmp_path):
+    data = measurements(30, seed=1)
+    write(tmp_path/"data.bin", DATASET_HEADER, [data[:15], data[15:]])
+    angles, poses = load_dataset(str(tmp_path/"data.bin"))
+    assert np.array_equal(np.hstack([angles, poses]), data)
+
+@pytest.mark.parametrize("name", ["circles.csv", "circles.bin"])
+@pytest.mark.parametrize("rows", [0, 20])
+def test_circles_dataset_round_trip(tmp_path, name, rows):
+    data = np.column_stack([np.repeat(np.arange(rows//10), 10), measurements(rows)])
+    write(tmp_path/name, CIRCLES_DATASET_HEADER, [data])
+    circles, angles, poses = load_circles_dataset(str(tmp_path/name))
+    assert circles.dtype.kind == 'i' and np.array_equal(circles, data[:, 0])
+    assert angles.shape == (rows, 6) and poses.shape == (rows, 6)
+    assert np.allclose(np.hstack([angles, poses]), data[:, 1:], rtol=1e-11, atol=0)
+
+def generated(config, tmp_path, workers: int, seed: int = 0, extension: str = ".bin") -> list:
+    from calibration_sim import HayatiModel
+    directory = tmp_path/f"{workers}_{seed}{extension}"
+    directory.mkdir()
+    config.update(general_samples_number=250, circle_samples_number=7,
+                  **{key: str(directory/f"{key}{extension}") for key in
+                     ("dataset_file", "base_circles_dataset_file", "tool_circles_dataset_file")})
+    model = HayatiModel(config)
+    rows, sampling = generate_datasets(model, chunk_size=60, workers=workers, seed=seed)
+    assert rows == {model.dataset_file: 250, model.base_circles_dataset_file: 7*model.circle_points_number,
+                    model.tool_circles_dataset_file: 7*model.circle_points_number}
+    assert sampling["accepted"] >= 250
+    if extension == ".bin":
+        assert read_binary_header(model.dataset_file)[0]["config_hash"] == model.config_hash
+    return [np.hstack(load_dataset(model.dataset_file))] + [np.column_stack(load_circles_dataset(path)) for path in
+                                                             (model.base_circles_dataset_file, model.tool_circles_dataset_file)]
+
+def test_seeded_generation_does_not_depend_on_workers(config, tmp_path):
+    single = generated(config, tmp_path, 1)
+    for expected, data in zip(single, generated(config, tmp_path, 2)):
+        assert np.array_equal(data, expected)
+    assert not np.array_equal(generated(config, tmp_path, 1, seed=1)[0], single[0])
+    for expected, data in zip(single, generated(config, tmp_path, 1, extension=".csv")):
+        assert np.allclose(data, expected, rtol=1e-11, atol=0)
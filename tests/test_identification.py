@@ -0,0 +1,104 @@
+import copy
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from identification import (PARAMS_NUMBER, pose_residuals, transforms_to_poses, levenberg_marquardt,
+                            levenberg_marquardt_streaming)
+from identifiability import analyze_identifiability
+from dataset import DATASET_HEADER, open_dataset_writer, load_dataset
+from parallel_identification import ParallelNormalEquations, levenberg_marquardt_parallel, run_optimization
+
+@pytest.fixture
+def angles(model) -> np.ndarray:
+    return np.random.default_rng(1).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (10, 6))
+
+def test_identification_jacobian_matches_finite_differences(model, angles):
+    model.identifiability_mask = np.ones(PARAMS_NUMBER, dtype='int')
+    model.measurable_params_mask = np.arange(6)
+    jac = model.get_identification_jacobian(angles, 'real')
+    vector = model.get_params_vector('real')
+    step = 1e-6
+    numeric = np.empty_like(jac)
+    for column in range(PARAMS_NUMBER):
+        shift = np.zeros(PARAMS_NUMBER)
+        shift[column] = step
+        model.set_params_vector('real', vector - shift)
+        lower = model.get_transition_matrices(angles, 'real')
+        model.set_params_vector('real', vector + shift)
+        upper = model.get_transition_matrices(angles, 'real')
+        numeric[:, :, column] = pose_residuals(lower, upper)/(2*step)
+    model.set_params_vector('real', vector)
+    assert np.allclose(jac, numeric, atol=1e-7)
+
+@pytest.fixture
+def measurements(model):
+    rng = np.random.default_rng(2)
+    angles = rng.uniform(model.joint_limits_general_l, model.joint_limits_general_h, (300, 6))
+    poses = transforms_to_poses(model.get_transition_matrices(angles, 'real')) + rng.normal(0, 1e-5, (300, 6))
+    analyze_identifiability(model, angles)
+    return angles, poses
+
+def calibrated(model, method, *args, **kwargs):
+    model = copy.deepcopy(model)
+    report = method(model, *args, **kwargs)
+    assert report["converged"]
+    return model.get_params_vector('estimated'), report
+
+def test_streaming_matches_in_memory(model, measurements, tmp_path):
+    expected, report = calibrated(model, levenberg_marquardt, *measurements)
+    assert np.max(np.abs(expected - model.get_params_vector('real'))[model.identifiability_mask == 1]) < 1e-3
+    vector, streaming_report = calibrated(model, levenberg_marquardt_streaming, *measurements, chunk_size=37)
+    assert np.allclose(vector, expected, rtol=0, atol=1e-10)
+    assert streaming_report["iterations"] == report["iterations"]
+
+    # Memory-mapped binary dataset
+    path = str(tmp_path/"data.bin")
+    with open_dataset_writer(path, DATASET_HEADER) as writer:
+        writer.append(np.hstack(measurements))
+    vector, _ = calibrated(model, levenberg_marquardt_streaming, *load_dataset(path), chunk_size=64)
+    assert np.allclose(vector, expected, rtol=0, atol=1e-10)
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_parallel_matches_in_memory(model, measurements, tmp_path, binary):
+    expected, report = calibrated(model, levenberg_marquardt, *measurements)
+    dataset_path = None
+    if binary:
+        dataset_path = str(tmp_path/"data.bin")
+        with open_dataset_writer(dataset_path, DATASET_HEADER) as writer:
+            writer.append(np.hstack(measurements))
+    vector, parallel_report = calibrated(model, levenberg_marquardt_parallel, *measurements, workers=2,
+                                         dataset_path=dataset_path)
+    assert parallel_report["workers"] == 2
+    assert np.allclose(vector, expected, rtol=0, atol=1e-10)
+    assert parallel_report["iterations"] == report["iterations"]
+
+def test_run_optimization_follows_the_config(model, measurements):
+    expected, _ = calibrated(model, levenberg_marquardt, *measurements)
+    for method in ("levenberg_marquardt_streaming", "levenberg_marquardt_parallel"):
+        model.optimization_method = method
+        vector, _ = calibrated(model, run_optimization, *measurements)
+        assert np.allclose(vector, expected, rtol=0, atol=1e-10)
+    model.optimization_method = "gauss_newton"
+    with pytest.raises(ValueError):
+        run_optimization(model, *measurements)
+
+def test_parallel_rejects_an_empty_dataset(model):
+    with pytest.raises(ValueError, match="no rows"):
+        levenberg_marquardt_parallel(model, np.empty((0, 6)), np.empty((0, 6)), workers=2)
+
+def test_parallel_releases_shared_memory_if_the_pool_fails(model, measurements, monkeypatch):
+    created = []
+    original = shared_memory.SharedMemory
+    def tracked(*args, **kwargs):
+        created.append(original(*args, **kwargs))
+        return created[-1]
+    def failing_pool(*args, **kwargs):
+        raise OSError("no processes left")
+    monkeypatch.setattr(shared_memory, "SharedMemory", tracked)
+    monkeypatch.setattr(mp, "Pool", failing_pool)
+    with pytest.raises(OSError):
+        ParallelNormalEquations(model, *measurements, workers=2)
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        original(name=created[0].name)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from identification import transforms_to_poses, pose_residuals
+from inverse_kinematics import InverseKinematics, geometric_jacobian
+
+@pytest.fixture
+def angles(model) -> np.ndarray:
+    return np.random.default_rng(5).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (100, 6))
+
+def test_batched_solve_converges(model, angles):
+    targets = model.get_transition_matrices(angles, 'real')
+    initial = angles + np.random.default_rng(6).uniform(-0.1, 0.1, angles.shape)
+    result = InverseKinematics(model, 'real', tolerance=1e-10).solve(targets, initial)
+    assert np.all(result["converged"])
+    assert np.all(result["errors"] <= 1e-10)
+    residuals = pose_residuals(model.get_transition_matrices(result["angles"], 'real'), targets)
+    assert np.max(np.abs(residuals)) < 1e-10
+
+def test_pose_targets_and_trajectory(model, angles):
+    # A smooth trajectory, every point starts from the previous solution
+    trajectory = np.linspace(angles[0], angles[0] + 0.3, 20)
+    poses = transforms_to_poses(model.get_transition_matrices(trajectory, 'real'))
+    solver = InverseKinematics(model, 'real')
+    result = solver.solve_trajectory(poses, trajectory[0])
+    assert np.all(result["converged"])
+    assert np.allclose(result["angles"], trajectory, atol=1e-6)
+    assert result["iterations"] < 10*len(trajectory)
+    assert np.all(solver.solve(poses, trajectory)["converged"])
+
+def test_joint_limits_are_respected(model, angles):
+    limits = (np.asarray(model.joint_limits_general_l), np.asarray(model.joint_limits_general_h))
+    result = InverseKinematics(model, 'real', joint_limits=limits).solve(model.get_transition_matrices(angles, 'nominal'))
+    assert np.all(result["angles"] >= limits[0]) and np.all(result["angles"] <= limits[1])
+
+def test_geometric_jacobian_matches_finite_differences(model, angles):
+    chain = model.get_chain('real')
+    end_tf, jac = geometric_jacobian(chain, angles[:5])
+    step = 1e-6
+    for joint in range(6):
+        shift = np.zeros(6)
+        shift[joint] = step
+        numeric = pose_residuals(chain.transition_matrices(angles[:5] - shift), chain.transition_matrices(angles[:5] + shift))
+        assert np.allclose(jac[:, :, joint], numeric/(2*step), atol=1e-7)
@@ -0,0 +1,53 @@
+import multiprocessing as mp
+import numpy as np
+import pytest
+from joint_state_channel import JointStateChannel
+
+STATES_NUMBER = 20000
+
+def write_states(channel: JointStateChannel, states_number: int):
+    # Every joint and the timestamp of state k equal k, a torn read mixes two numbers
+    for number in range(1, states_number + 1):
+        channel.write(np.full(channel.joints_number, float(number)), timestamp=float(number))
+
+def check_state(number: int, timestamp: float, angles: np.ndarray):
+    assert timestamp == number
+    assert np.all(angles == number)
+
+def test_concurrent_reads_are_never_torn():
+    with JointStateChannel.create(capacity=8) as channel:
+        writer = mp.Process(target=write_states, args=(channel, STATES_NUMBER))
+        writer.start()
+        last_number = reads = 0
+        while writer.is_alive() or last_number < channel.written:
+            state = channel.latest()
+            if state is None:
+                continue
+            check_state(*state)
+            assert state[0] >= last_number
+            numbers, timestamps, angles = channel.read_since(last_number)
+            for number, timestamp, state_angles in zip(numbers, timestamps, angles):
+                check_state(number, timestamp, state_angles)
+            last_number = max(state[0], numbers[-1] if numbers.size else 0)
+            reads += 1
+        writer.join()
+        assert writer.exitcode == 0
+        assert last_number == STATES_NUMBER
+        assert reads > 0
+
+def test_read_since_returns_only_newer_states_kept_in_the_ring():
+    with JointStateChannel.create(capacity=4, joints_number=2) as channel:
+        assert channel.latest() is None
+        write_states(channel, 6)
+        numbers, timestamps, angles = channel.read_since(1)
+        assert numbers.tolist() == [3, 4, 5, 6]
+        assert timestamps.tolist() == [3, 4, 5, 6]
+        assert angles.shape == (4, 2)
+
+def test_latest_times_out_on_a_slot_left_mid_write():
+    with JointStateChannel.create(capacity=4) as channel:
+        write_states(channel, 1)
+        # A writer which died between the two sequence updates leaves the slot odd forever
+        channel.sequences[0] = 1
+        with pytest.raises(TimeoutError):
+            channel.latest(timeout=0.05)
@@ -0,0 +1,44 @@
+import pygame
+import pytest
+from joystick import JointJoysticks, get_font
+
+class CountingFont:
+    def __init__(self, font):
+        self.font = font
+        self.renders = 0
+
+    def render(self, *args):
+        self.renders += 1
+        return self.font.render(*args)
+
+@pytest.fixture
+def joysticks(model):
+    window = JointJoysticks(model.joint_limits_general_h, model.joint_limits_general_l, "test")
+    yield window
+    pygame.quit()
+    get_font.cache_clear()
+
+def test_fonts_are_loaded_once_per_size(joysticks):
+    assert get_font(24) is get_font(24) is joysticks.small_font
+    assert get_font(36) is not get_font(24)
+
+def test_text_is_rendered_only_when_it_changes(joysticks):
+    joysticks.font, joysticks.small_font = CountingFont(joysticks.font), CountingFont(joysticks.small_font)
+    assert joysticks.draw_joint_joysticks()
+    # Static labels of the background, knob values and value rows on the first frame
+    assert joysticks.small_font.renders == 4*len(joysticks.joysticks)
+    assert joysticks.font.renders == len(joysticks.joysticks)
+
+    joysticks.font.renders = joysticks.small_font.renders = 0
+    joysticks.draw_joint_joysticks()
+    assert joysticks.font.renders == joysticks.small_font.renders == 0
+
+    joysticks.joysticks[0].value = 0.5
+    joysticks.joysticks[0].update_knob_position_from_value()
+    joysticks.draw_joint_joysticks()
+    assert joysticks.font.renders == 1 and joysticks.small_font.renders == 1
+
+def test_linear_joystick_draw_uses_the_cached_font(joysticks, monkeypatch):
+    monkeypatch.setattr(pygame.font, "Font", lambda *args: pytest.fail("font loaded during draw"))
+    joysticks.joysticks[0].draw(joysticks.screen)
+    assert not joysticks.joysticks[0].dirty
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from functools import reduce
+from math_routines import pose_tf
+
+def scalar_fk(model, angles: np.ndarray, type: str) -> np.ndarray:
+    # Product of the per-link dh_trans/hayati_trans matrices, the reference for the precomputed chain
+    dh, base_params, tool_params = model.get_model_params(type)
+    return reduce(np.matmul, [pose_tf(base_params)] + model.get_transforms(angles, dh) + [pose_tf(tool_params)])
+
+@pytest.fixture
+def angles(model) -> np.ndarray:
+    return np.random.default_rng(1).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (50, 6))
+
+@pytest.mark.parametrize("type", ["nominal", "real"])
+def test_chain_matches_scalar_fk(model, angles, type):
+    expected = np.array([scalar_fk(model, pose_angles, type) for pose_angles in angles])
+    assert np.allclose(model.get_transition_matrices(angles, type), expected, atol=1e-12)
+    assert np.allclose(np.array([model.get_transition_matrix(pose_angles, type) for pose_angles in angles]), expected, atol=1e-12)
+    assert np.allclose(model.get_frames(angles, type)[:, -1], expected, atol=1e-12)
+
+def test_frames_end_with_flange_and_tool(model, angles):
+    frames = model.get_frames(angles, 'real')
+    assert frames.shape == (angles.shape[0], 8, 4, 4)
+    assert np.allclose(frames[:, 0], model.get_chain('real').base_tf)
+    assert np.allclose(frames[:, -2] @ model.get_chain('real').tool_tf, frames[:, -1])
+    assert np.allclose(model.get_joint_coordinates(angles, 'real'), frames[..., :3, 3])
+
+def test_joint_coordinates_single_and_batched(model, angles):
+    batched = model.get_joint_coordinates(angles, 'nominal')
+    assert batched.shape == (angles.shape[0], 8, 3)
+    for pose_angles, coords in zip(angles[:5], batched):
+        single = model.get_joint_coordinates_and_transition_matrix(pose_angles, 'nominal')
+        assert np.allclose(single["coords"], coords)
+        assert np.allclose(single["transition_matrix"], scalar_fk(model, pose_angles, 'nominal'))
+    # The last point is the tool point of the transition matrix
+    assert np.allclose(batched[:, -1], model.get_transition_matrices(angles, 'nominal')[:, :3, 3])
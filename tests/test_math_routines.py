@@ -0,0 +1,26 @@
+import numpy as np
+from math_routines import (x_rot, y_rot, z_rot, trans, arbitrary_axis_rot, pose_tf, x_rot_batch, y_rot_batch, z_rot_batch,
+                           trans_batch, arbitrary_axis_rot_batch, pose_tf_batch)
+
+def test_scalar_and_batch_builders_agree():
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-np.pi, np.pi, 20)
+    axes = rng.normal(size=(20, 3))
+    axes /= np.linalg.norm(axes, axis=1)[:, None]
+    poses = rng.normal(size=(20, 6))
+    for scalar, batch in ((x_rot, x_rot_batch), (y_rot, y_rot_batch), (z_rot, z_rot_batch)):
+        assert np.allclose(np.array([scalar(angle) for angle in angles]), batch(angles))
+    assert np.allclose(np.array([trans(pose) for pose in poses]), trans_batch(poses[:, :3]))
+    assert np.allclose(np.array([arbitrary_axis_rot(axis, angle) for axis, angle in zip(axes, angles)]),
+                       arbitrary_axis_rot_batch(axes, angles))
+    assert np.allclose(np.array([pose_tf(pose) for pose in poses]), pose_tf_batch(poses))
+
+def test_pose_tf_is_trans_zyx():
+    pose = [0.1, -0.2, 0.3, 0.4, -0.5, 0.6]
+    assert np.allclose(pose_tf(pose), trans(pose) @ z_rot(pose[3]) @ y_rot(pose[4]) @ x_rot(pose[5]))
+
+def test_arbitrary_axis_rot_keeps_the_axis():
+    axis = np.array([0, 0.6, 0.8])
+    rotation = arbitrary_axis_rot(axis, 1.2)
+    assert np.allclose(rotation @ axis, axis)
+    assert np.allclose(rotation @ rotation.T, np.eye(3))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from identification import pose_residuals, measured_transforms
+from measurement_model import (IsotropicNoise, TrackerNoise, EncoderQuantization, OutlierInjection, MeasurementModel,
+                               rotate_orientations)
+
+TRACKER_POSITION = [0.386748434685619, 1.1945282765584728, 1.7519490761188377]
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-2, 2, (2000, 6))
+    poses = np.hstack([rng.uniform(-1, 1, (2000, 3)), rng.uniform(-1.5, 1.5, (2000, 3))])
+    return angles, poses
+
+def rotation_errors(poses: np.ndarray, noisy: np.ndarray) -> np.ndarray:
+    return np.linalg.norm(pose_residuals(measured_transforms(poses), measured_transforms(noisy))[:, 3:], axis=1)
+
+def test_zero_tracker_noise_is_identity(data):
+    angles, poses = data
+    noisy_angles, noisy = TrackerNoise(TRACKER_POSITION).apply(angles.copy(), poses.copy(), np.random.default_rng(1))
+    assert np.array_equal(noisy_angles, angles)
+    assert np.allclose(noisy[:, :3], poses[:, :3], rtol=0, atol=1e-14)
+    assert np.array_equal(noisy[:, 3:], poses[:, 3:])
+
+def test_tracker_range_error(data):
+    _, poses = data
+    _, noisy = TrackerNoise(TRACKER_POSITION, range_std=1e-4).apply(None, poses.copy(), np.random.default_rng(1))
+    range_errors = np.linalg.norm(noisy[:, :3] - TRACKER_POSITION, axis=1) - np.linalg.norm(poses[:, :3] - TRACKER_POSITION, axis=1)
+    assert np.isclose(np.std(range_errors), 1e-4, rtol=0.1)
+    # No angular error: every point moves along its line of sight
+    directions = (poses[:, :3] - TRACKER_POSITION)/np.linalg.norm(poses[:, :3] - TRACKER_POSITION, axis=1)[:, None]
+    assert np.allclose(np.cross(noisy[:, :3] - poses[:, :3], directions), 0, atol=1e-12)
+
+def test_encoder_quantization_is_on_the_resolution_grid(data):
+    angles, poses = data
+    resolution = np.array([1e-3, 1e-3, 2e-3, 2e-3, 5e-3, 5e-3])
+    quantized, same_poses = EncoderQuantization(resolution).apply(angles, poses, np.random.default_rng(1))
+    steps = quantized/resolution
+    assert np.allclose(steps, np.round(steps), rtol=0, atol=1e-9)
+    assert np.all(np.abs(quantized - angles) <= resolution/2 + 1e-12)
+    assert same_poses is poses
+
+def test_outliers_move_the_expected_fraction_by_magnitude(data):
+    angles, poses = data
+    _, noisy = OutlierInjection(fraction=0.1, magnitude=0.01).apply(angles, poses.copy(), np.random.default_rng(1))
+    shifts = np.linalg.norm(noisy[:, :3] - poses[:, :3], axis=1)
+    moved = shifts > 0
+    # Binomial(2000, 0.1): std is about 13 poses
+    assert abs(np.count_nonzero(moved) - 200) < 60
+    assert np.allclose(shifts[moved], 0.01)
+    assert np.array_equal(noisy[:, 3:], poses[:, 3:])
+
+def test_orientation_noise_does_not_depend_on_the_euler_angles(data):
+    _, poses = data
+    poses[:, 4] = np.pi/2 - 1e-6
+    std = 1e-4
+    _, noisy = IsotropicNoise(orientation_std=std).apply(None, poses.copy(), np.random.default_rng(1))
+    errors = rotation_errors(poses, noisy)
+    # Norm of a 3D Gaussian: mean 1.6*std, the additive Euler noise would be orders of magnitude larger here
+    assert np.isclose(np.mean(errors), 2*np.sqrt(2/np.pi)*std, rtol=0.1)
+    assert np.max(errors) < 10*std
+
+def test_rotate_orientations_applies_base_frame_rotations():
+    poses = np.array([[0.1, 0.2, 0.3, 0.4, -0.5, 0.6], [0, 0, 0, 0, 0, 0]])
+    rotated = poses.copy()
+    rotate_orientations(rotated, np.array([[0, 0, 0.2], [0, 0, 0]]))
+    assert np.array_equal(rotated[1], poses[1])
+    assert np.allclose(rotated[0, 3], 0.6) and np.allclose(rotated[0, 4:], poses[0, 4:])
+
+def test_measurement_model_chain(data):
+    angles, poses = data
+    original_angles, original_poses = angles.copy(), poses.copy()
+    model = MeasurementModel.from_config([{"type": "tracker", "range_std": 1e-5, "orientation_std": 1e-5},
+                                          {"type": "encoder_quantization", "resolution": 1e-4},
+                                          {"type": "outliers", "fraction": 0.01}], TRACKER_POSITION)
+    assert np.allclose(model.components[0].tracker_position, TRACKER_POSITION)
+    noisy_angles, noisy = model.apply(angles, poses, np.random.default_rng(1))
+    assert np.array_equal(angles, original_angles) and np.array_equal(poses, original_poses)
+    assert not np.array_equal(noisy, poses) and not np.array_equal(noisy_angles, angles)
+    # Seeded rng gives the same measurements
+    assert np.array_equal(model.apply(angles, poses, np.random.default_rng(1))[1], noisy)
+    with pytest.raises(ValueError, match="laser"):
+        MeasurementModel.from_config([{"type": "laser"}])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from identification import PARAMS_NUMBER, BASE_OFFSET, TOOL_OFFSET
+from monte_carlo import perturbation_std, run_trial, run_study
+
+@pytest.fixture
+def model(model):
+    model.study_poses_number, model.study_validation_poses_number, model.study_circles_number = 100, 200, 4
+    return model
+
+def test_perturbation_std_layout(model):
+    std = perturbation_std(model)
+    assert std.shape == (PARAMS_NUMBER,)
+    assert np.array_equal(std[:4], model.study_dh_std)
+    assert np.all(std[BASE_OFFSET:BASE_OFFSET + 3] == model.study_base_tool_std[0])
+    assert np.all(std[TOOL_OFFSET + 3:] == model.study_base_tool_std[1])
+
+def test_trial_is_determined_by_its_seed(model):
+    seed = np.random.SeedSequence(7)
+    first, second = run_trial(model, 0, seed), run_trial(model, 0, seed)
+    assert first["converged"] and first["optimization_method"] == model.optimization_method
+    # Noise-free measurements
+    assert first["rms_position_error"] < 1e-8
+    assert np.array_equal(first["params_error"], second["params_error"], equal_nan=True)
+    # Trials work on copies
+    assert np.array_equal(model.get_params_vector('estimated'), model.get_params_vector('nominal'))
+
+def test_study_does_not_depend_on_workers(model):
+    model.optimization_method = "levenberg_marquardt_parallel"
+    single = run_study(model, trials=3, workers=1, seed=1)
+    pooled = run_study(model, trials=3, workers=2, seed=1)
+    assert single["trials_number"] == 3 and single["summary"]["converged_fraction"] == 1.0
+    assert {trial["optimization_method"] for trial in single["trials"]} == {"levenberg_marquardt_parallel"}
+    # Pool workers fall back to the in-process solver, which reaches the same estimates
+    assert {trial["optimization_method"] for trial in pooled["trials"]} == {"levenberg_marquardt"}
+    for expected, trial in zip(single["trials"], pooled["trials"]):
+        assert trial["trial"] == expected["trial"]
+        assert np.allclose(np.array(trial["params_error"], dtype='float'), np.array(expected["params_error"], dtype='float'),
+                           rtol=0, atol=1e-9, equal_nan=True)
+    assert set(single["summary"]["params_error"]) == set(pooled["summary"]["params_error"])
@@ -0,0 +1,28 @@
+import os
+import resource
+import numpy as np
+import pytest
+from PIL import Image
+from offscreen_rendering import FRAME_NAME, encode_video
+
+def open_descriptors_bound() -> int:
+    return max(int(fd) for fd in os.listdir("/proc/self/fd")) + 1
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count open file descriptors")
+def test_gif_encoding_does_not_keep_frames_open(tmp_path):
+    frames = 200
+    for index in range(frames):
+        Image.fromarray(np.full((8, 8, 3), index, dtype='uint8')).save(tmp_path / FRAME_NAME.format(index))
+    output = str(tmp_path / "video.gif")
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = open_descriptors_bound() + 32
+    assert limit < frames
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    try:
+        encode_video(str(tmp_path), output, frames, fps=50)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    with Image.open(output) as video:
+        assert video.n_frames == frames
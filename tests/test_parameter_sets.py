@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from parameter_sets import ParameterSet
+
+DH = [[0, 1.5708, 0, 3.14, 0], [0.8, 0, 0, 1.5708, 1], [0.72, 0, 0, 0, 1],
+      [0, -1.5708, -0.191, -1.5708, 0], [0, -1.5708, 0.13, 0, 0], [0, 0, 0.176, 0, 0]]
+
+def test_params_can_not_be_edited_in_place():
+    parameter_set = ParameterSet("estimated", DH, [0]*6, [0, 0, 0, 0, 0, 1.5708])
+    with pytest.raises(TypeError):
+        parameter_set.dh[1][0] = 0.9
+    with pytest.raises(TypeError):
+        parameter_set.tool_params[2] = 0.1
+
+def test_set_rebuilds_cached_data():
+    dh = [list(unit) for unit in DH]
+    parameter_set = ParameterSet("estimated", dh, [0]*6, [0]*6)
+    chain, vector = parameter_set.chain, parameter_set.vector
+    # The caller's lists are copied, editing them afterwards does not change the set
+    dh[1][0] = 0.9
+    assert parameter_set.vector[4] == 0.8
+    version = parameter_set.version
+    parameter_set.set(dh=dh)
+    assert parameter_set.version == version + 1
+    assert parameter_set.chain is not chain
+    assert parameter_set.vector[4] == 0.9
+    assert np.array_equal(np.delete(parameter_set.vector, 4), np.delete(vector, 4))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from pose_selection import select_poses, observability_indices
+from identifiability import analyze_identifiability
+from dataset import generate_datasets, load_dataset
+
+@pytest.fixture
+def candidates(model) -> np.ndarray:
+    return np.random.default_rng(3).uniform(model.joint_limits_general_l, model.joint_limits_general_h, (300, 6))
+
+@pytest.fixture
+def mask(model, candidates) -> np.ndarray:
+    return np.array(analyze_identifiability(model, candidates, 'nominal', update_model=False)["identifiability_mask"])
+
+def log_det(model, angles: np.ndarray, mask: np.ndarray) -> float:
+    # Column normalization of select_poses shifts log det by the same constant for every subset
+    return observability_indices(model.get_identification_jacobian(angles, 'nominal', mask))["D"]
+
+def test_selected_poses_beat_random_subsets(model, candidates, mask):
+    poses_number = 30
+    selection = select_poses(model, candidates, poses_number, identifiability_mask=mask)
+    assert len(selection["indices"]) == poses_number == len(set(selection["indices"]))
+    selected = log_det(model, candidates[selection["indices"]], mask)
+    rng = np.random.default_rng(4)
+    random = [log_det(model, candidates[rng.choice(len(candidates), poses_number, replace=False)], mask) for _ in range(20)]
+    assert selected > max(random)
+    assert selection["indices_selected"]["O1"] > 0
+
+def test_exchange_passes_do_not_decrease_log_det(model, candidates, mask):
+    greedy = select_poses(model, candidates, 20, exchange_passes=0, identifiability_mask=mask)
+    exchanged = select_poses(model, candidates, 20, exchange_passes=3, identifiability_mask=mask)
+    assert log_det(model, candidates[exchanged["indices"]], mask) >= log_det(model, candidates[greedy["indices"]], mask) - 1e-9
+
+@pytest.mark.parametrize("samples_number", [0, 15])
+def test_dataset_generation_keeps_the_model_mask(config, samples_number):
+    from calibration_sim import HayatiModel
+    config.update(general_samples_number=samples_number, circle_samples_number=1, pose_selection_candidates=200,
+                  identifiability_poses_number=100)
+    model = HayatiModel(config)
+    model.identifiability_mask[5] = 0
+    expected = model.identifiability_mask.copy()
+    generate_datasets(model, workers=1, seed=0)
+    assert np.array_equal(model.identifiability_mask, expected)
+    assert load_dataset(model.dataset_file)[0].shape == (samples_number, 6)
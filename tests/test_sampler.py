@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from sampler import WorkspaceSampler
+
+def sampler(model, rng: int = 0, **options) -> WorkspaceSampler:
+    return WorkspaceSampler(model, model.joint_limits_general_l, model.joint_limits_general_h, 'real', rng, **options)
+
+def test_accepted_poses_satisfy_the_limits(model):
+    model.cartesian_limits = [[0.2, 0.9], [-0.5, 0.5], [0.3, 1.0]]
+    model.max_z_angle = 2.5
+    workspace_sampler = sampler(model)
+    angles = workspace_sampler.sample(500)
+    assert angles.shape == (500, 6) and workspace_sampler.accepted_number >= 500
+    tfs = model.get_transition_matrices(angles, 'real')
+    limits = np.asarray(model.cartesian_limits)
+    assert np.all((tfs[:, :3, 3] >= limits[:, 0]) & (tfs[:, :3, 3] <= limits[:, 1]))
+    assert np.all(np.arccos(np.clip(tfs[:, 2, 2], -1, 1)) <= model.max_z_angle)
+    assert np.all((angles >= model.joint_limits_general_l) & (angles <= model.joint_limits_general_h))
+
+def test_adapted_proposal_stays_inside_the_joint_limits(model):
+    # A small box gives a low acceptance rate, so the proposal is narrowed
+    model.cartesian_limits = [[0.6, 0.8], [-0.1, 0.1], [0.4, 0.6]]
+    workspace_sampler = sampler(model)
+    workspace_sampler.sample(200)
+    assert np.any(workspace_sampler.proposal_h - workspace_sampler.proposal_l
+                  < workspace_sampler.joint_limits_h - workspace_sampler.joint_limits_l)
+    assert np.all(workspace_sampler.proposal_l >= workspace_sampler.joint_limits_l)
+    assert np.all(workspace_sampler.proposal_h <= workspace_sampler.joint_limits_h)
+    assert np.all(workspace_sampler.proposal_l <= workspace_sampler.accepted_l)
+    assert np.all(workspace_sampler.proposal_h >= workspace_sampler.accepted_h)
+
+def test_same_seed_gives_the_same_samples(model):
+    assert np.array_equal(sampler(model, 5).sample(100), sampler(model, 5).sample(100))
+
+def test_unreachable_workspace_raises(model):
+    model.cartesian_limits = [[5, 6], [5, 6], [5, 6]]
+    with pytest.raises(ValueError, match="cartesian_limits"):
+        sampler(model, max_batch_size=20000).sample(10)
@@ -0,0 +1,29 @@
+import time
+import numpy as np
+import calibration_sim
+from calibration_sim import frame_statistics, vizualize
+from joint_state_channel import JointStateChannel
+
+def fake_joystick_process(upper_limit, lower_limit, channel, running, name):
+    # A few joystick moves over 0.5 s, then the window is "closed"
+    for step in range(10):
+        channel.write(np.full(6, 0.05*step))
+        time.sleep(0.05)
+    running.value = 0
+
+def test_frame_statistics():
+    assert frame_statistics([]) == {"frames": 0}
+    stats = frame_statistics([0.01, 0.02, 0.03])
+    assert stats["frames"] == 3 and np.isclose(stats["mean_frame_time"], 0.02) and stats["max_frame_time"] == 0.03
+
+def test_render_loop_is_paced_and_draws_only_changed_states(model, monkeypatch):
+    monkeypatch.setattr(calibration_sim.joystick, "joystick_process", fake_joystick_process)
+    polls = []
+    latest = JointStateChannel.latest
+    monkeypatch.setattr(JointStateChannel, "latest", lambda self, *args: polls.append(1) or latest(self, *args))
+    start = time.perf_counter()
+    stats = vizualize(model)
+    elapsed = time.perf_counter() - start
+    # At most one poll per 1/60 s frame instead of a busy loop
+    assert len(polls) <= 60*elapsed + 5
+    assert 1 <= stats["frames"] <= 10